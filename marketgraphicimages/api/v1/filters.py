@@ -1,12 +1,12 @@
-from django.db.models import Q, Count
 from django_filters.rest_framework import FilterSet, filters
 
 from images.models import Image
+from images.search import search_images
 
-REGAX_PATTERNS = {
-    'raster_image': r'\.(png|jpe?g|webp)$',
-    'vector_image': r'\.(svg)$',
-    'gif_image': r'\.(gif)$',
+CATEGORIES = {
+    'raster_image': Image.Category.RASTER,
+    'vector_image': Image.Category.VECTOR,
+    'gif_image': Image.Category.GIF,
 }
 
 
@@ -17,8 +17,7 @@ class ImageFilter(FilterSet):
     Parameters:
     - Filter by tags.
     - Filter by category based on format of image.
-    - FIlter by name. Double filtering: by entering the beginning of the name,
-    by entering an arbitrary place.
+    - Full-text search by name, tags and author.
     """
 
     tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
@@ -46,17 +45,16 @@ class ImageFilter(FilterSet):
         Filters the given `queryset` based on the `value` parameter.
         """
 
-        regax = REGAX_PATTERNS.get(value)
-        if regax:
-            return queryset.filter(image__regex=regax).annotate(
-                favorite_count=Count('favoriteimage__image')
-            ).order_by('-favorite_count')
+        category = CATEGORIES.get(value)
+        if category:
+            return queryset.filter(category=category).order_by(
+                '-favorites_count'
+            )
         return Image.objects.none()
 
     def filter_name(self, queryset, _, value):
         """
-        Filters the specified `queryset` of queries based on the match with
-        the beginning of the name, then by a match anywhere in the name.
+        Filters the specified `queryset` with the full-text search by
+        the name, the tags and the author of images, most relevant first.
         """
-        return queryset.filter(Q(name__icontains=value) | Q(
-            name__startswith=value)).distinct()
+        return search_images(queryset, value)
@@ -1,4 +1,7 @@
 
+import os
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
@@ -8,14 +11,18 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import NotFound, ValidationError
 
-from marketgraphicimages.settings import (
-    IMAGES_RECOMENDED_SIZE,
-    MAX_NUM_OF_TAGS_RECOMENDED_COMBO,
-)
+from marketgraphicimages.settings import IMAGES_RECOMENDED_SIZE
 
-from core.encryption_str import verify_value
+from core.confirmation_code import check_confirmation_code
+from core.derivatives import generate_image_derivatives
+from core.image_hash import compute_dhash
+from core.metrics import TimedSerializerMixin
 from core.validators import validate_email
-from images.models import FavoriteImage, Image, TagImage
+from images.duplicates import LINK, REJECT, find_duplicates
+from images.feed import fan_out_image
+from images.models import FavoriteImage, Image, ImageUpload, TagImage
+from jobs.queue import enqueue
+from tags.covers import get_tag_covers
 from tags.models import Tag
 from users.models import ConfirmationCode, Subscription
 
@@ -83,7 +90,7 @@ class ConfirmationSerializer(serializers.ModelSerializer):
         email_user = get_object_or_404(ConfirmationCode,
                                        email=data.get('email'))
         confirmation_code = data.get('confirmation_code')
-        if not verify_value(confirmation_code, email_user.confirmation_code):
+        if not check_confirmation_code(email_user, confirmation_code):
             raise ValidationError(
                 detail={'confirmation_code': _('Invalid confirmation code')},
             )
@@ -157,7 +164,7 @@ class AuthSignInSerializer(serializers.Serializer):
             )
 
 
-class BaseTagSerializer(serializers.ModelSerializer):
+class BaseTagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Base serializer for Tags model."""
 
     class Meta:
@@ -175,8 +182,16 @@ class TagSerializer(BaseTagSerializer):
     tag_images = serializers.SerializerMethodField()
 
     def get_tag_images(self, obj):
+        """Getting a random image of the tag from its cover pool."""
+
         if self.context.get('request'):
-            images = Image.objects.filter(tags=obj.id).order_by('?')[:1]
+            if 'tag_covers' in self.context:
+                image = self.context['tag_covers'].get(obj.id)
+                images = [image] if image else []
+            else:
+                images = Image.objects.filter(
+                    id__in=get_tag_covers((obj.id,)).values()
+                ).with_is_favorited(self.context['request'].user)
             serializer = ImageShortSerializer(
                 images, many=True, context=self.context
             )
@@ -186,7 +201,8 @@ class TagSerializer(BaseTagSerializer):
         fields = BaseTagSerializer.Meta.fields + ('tag_images', )
 
 
-class BaseShortUserSerializer(serializers.ModelSerializer):
+class BaseShortUserSerializer(TimedSerializerMixin,
+                              serializers.ModelSerializer):
     """Base serializer for user class."""
 
     class Meta:
@@ -194,6 +210,60 @@ class BaseShortUserSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'profile_photo', 'role')
 
 
+def prefetch_subscriptions(context: dict, authors) -> dict:
+    """
+    Resolves whether the user of the request is subscribed to each of
+    the authors with one query and remembers the result in the
+    serializer context, so embedded author serializers do not query
+    the database one by one.
+
+    Args:
+        context (dict): The context of the root serializer.
+        authors: Users to resolve, the known ones are skipped.
+
+    Returns:
+        dict: Ids of the resolved authors mapped to `is_subscribed`.
+    """
+    subscribed = context.setdefault('subscribed_authors', {})
+    user = context['request'].user
+    author_ids = {author.id for author in authors} - subscribed.keys()
+    if not author_ids:
+        return subscribed
+    subscribed.update(dict.fromkeys(author_ids, False))
+    if user.is_authenticated:
+        subscribed.update(dict.fromkeys(
+            Subscription.objects.filter(
+                subscriber=user, author_id__in=author_ids - {user.id}
+            ).values_list('author_id', flat=True),
+            True,
+        ))
+    return subscribed
+
+
+class AuthorListSerializer(serializers.ListSerializer):
+    """
+    List serializer of authors or of objects embedding an author, which
+    resolves the subscriptions to all the authors in one query.
+    """
+
+    def to_representation(self, data):
+        items = list(
+            data.all() if isinstance(data, models.manager.BaseManager)
+            else data
+        )
+        if isinstance(self.child, AuthorSerializer):
+            authors = items
+        else:
+            authors = [
+                getattr(item, field.source)
+                for field in self.child.fields.values()
+                if isinstance(field, AuthorSerializer)
+                for item in items
+            ]
+        prefetch_subscriptions(self.context, authors)
+        return super().to_representation(items)
+
+
 class AuthorSerializer(BaseShortUserSerializer):
     """Serializer for image author user model."""
 
@@ -208,23 +278,33 @@ class AuthorSerializer(BaseShortUserSerializer):
         fields = BaseShortUserSerializer.Meta.fields + (
             'is_subscribed', 'num_of_author_images'
         )
+        list_serializer_class = AuthorListSerializer
 
     def get_is_subscribed(self, obj):
         """Checking if the user is subscribed to the specified author."""
 
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                subscriber=user, author=obj).exists()
-        return False
+        return prefetch_subscriptions(self.context, (obj,))[obj.id]
 
     def get_num_of_author_images(self, obj):
         """Getting the number of published images of an author."""
 
-        return obj.images.count()
+        return obj.images_count
+
+
+def get_non_negative_int(query_params, name: str, default: int) -> int:
+    """
+    Returns the query parameter as a non-negative integer, or the
+    default if it is missing or invalid.
+    """
+    try:
+        value = int(query_params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= 0 else default
 
 
-class ImageBaseGetSerializer(serializers.ModelSerializer):
+class ImageBaseGetSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     """Image model base serializer."""
 
     author = BaseShortUserSerializer(read_only=True)
@@ -236,12 +316,15 @@ class ImageBaseGetSerializer(serializers.ModelSerializer):
         model = Image
         fields = (
             'id', 'created', 'author', 'name', 'image', 'is_favorited',
-            'license', 'price',
+            'license', 'price', 'thumbnail', 'thumbnail_width',
+            'thumbnail_height', 'preview', 'preview_width', 'preview_height',
         )
 
     def get_is_favorited(self, obj):
         """Checking if the specified image is in the favorites list."""
 
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_authenticated:
             return FavoriteImage.objects.filter(image=obj, user=user).exists()
@@ -273,41 +356,27 @@ class ImageGetSerializer(ImageBaseGetSerializer):
         fields = ImageBaseGetSerializer.Meta.fields + (
             'in_favorites', 'tags', 'extension', 'recommended',
         )
+        list_serializer_class = AuthorListSerializer
 
     def get_recommended(self, obj):
         """Getting a paginated list of recommendations based on most popular
-        combo of tags and returns the [offset:limit] number of images
+        combo of tags and returns `limit` images starting from `offset`.
+        Invalid values fall back to the defaults, as in the pagination
+        of lists.
         """
 
-        tags = Tag.objects.filter(
-            id__in=obj.tags.all()
-        ).annotate(
-            image_count=models.Count('tagimage')
-        ).order_by(
-            '-image_count'
-        )[:MAX_NUM_OF_TAGS_RECOMENDED_COMBO]
-        images = Image.objects.none()
-        for сombination in range(tags.count(), 0, -1):
-            new_images = Image.objects.annotate(
-                num_of_tags=models.Count(
-                    'tags', filter=models.Q(tags__in=tags[:сombination])
-                )
-            ).filter(
-                num_of_tags=сombination
-            ).exclude(
-                id=obj.id
-            ).exclude(
-                id__in=images
-            ).distinct()
-            images = images | new_images
-
-        limit = self.context['request'].query_params.get(
-            'limit', IMAGES_RECOMENDED_SIZE
-        )
-        offset = self.context['request'].query_params.get(
-            'offset', 0
+        query_params = self.context['request'].query_params
+        limit = get_non_negative_int(
+            query_params, 'limit', IMAGES_RECOMENDED_SIZE
         )
-        images = images[int(offset):int(limit)]
+        offset = get_non_negative_int(query_params, 'offset', 0)
+        images = Image.objects.filter(
+            recommended_for__image=obj
+        ).order_by(
+            '-recommended_for__score', '-created'
+        ).with_is_favorited(
+            self.context['request'].user
+        )[offset:offset + limit]
         serializer = ImageShortSerializer(
             images, many=True, context=self.context
         )
@@ -317,15 +386,16 @@ class ImageGetSerializer(ImageBaseGetSerializer):
         """Getting the number of times an image has been added to favorites.
         """
 
-        return FavoriteImage.objects.filter(image__id=obj.id).count()
+        return obj.favorites_count
 
     def get_extension(self, obj):
         """Getting the extension of image."""
 
-        return obj.image.name.split('.')[-1].upper()
+        return obj.extension or obj.image.name.split('.')[-1].upper()
 
 
-class ImageBaseCreateAndEditSerializer(serializers.ModelSerializer):
+class ImageBaseCreateAndEditSerializer(TimedSerializerMixin,
+                                       serializers.ModelSerializer):
     """Base serializer for post, put and patch requests."""
 
     tags = serializers.PrimaryKeyRelatedField(
@@ -339,11 +409,40 @@ class ImageBaseCreateAndEditSerializer(serializers.ModelSerializer):
         fields = ('name', 'image', 'license', 'price', 'tags', )
         read_only_fields = ('role', )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.duplicates = []
+
+    def validate_image(self, value):
+        """Looks for earlier uploads of the same picture."""
+
+        self.duplicates = find_duplicates(
+            compute_dhash(value),
+            exclude_id=self.instance.pk if self.instance else None,
+        )
+        if self.duplicates and settings.IMAGE_DUPLICATE_MODE == REJECT:
+            raise serializers.ValidationError(
+                _('This image has already been uploaded.')
+            )
+        return value
+
+    def get_duplicate_of(self):
+        """Returns the id of the closest duplicate to link the image to."""
+
+        if self.duplicates and settings.IMAGE_DUPLICATE_MODE == LINK:
+            return self.duplicates[0]
+        return None
+
     def to_representation(self, instance):
+        # Derivatives are generated by a background job.
+        instance.refresh_from_db()
         serializer = ImageGetSerializer(
             instance, context={'request': self.context.get('request')}
         )
-        return serializer.data
+        data = serializer.data
+        if self.duplicates:
+            data['duplicates'] = self.duplicates
+        return data
 
     @transaction.atomic
     def update(self, instance, validated_data):
@@ -354,7 +453,11 @@ class ImageBaseCreateAndEditSerializer(serializers.ModelSerializer):
             TagImage.objects.filter(image=instance).delete()
             tags = validated_data.pop('tags')
             instance.tags.set(tags)
+        if 'image' in validated_data:
+            validated_data['duplicate_of_id'] = self.get_duplicate_of()
         super().update(instance, validated_data)
+        if 'image' in validated_data:
+            enqueue(generate_image_derivatives, image_id=instance.pk)
         return instance
 
 
@@ -367,8 +470,12 @@ class ImagePostPutSerializer(ImageBaseCreateAndEditSerializer):
         TagImage table."""
 
         tags = validated_data.pop('tags')
-        new_image = Image.objects.create(**validated_data)
+        new_image = Image.objects.create(
+            **validated_data, duplicate_of_id=self.get_duplicate_of()
+        )
         new_image.tags.set(tags)
+        enqueue(generate_image_derivatives, image_id=new_image.pk)
+        enqueue(fan_out_image, image_id=new_image.pk)
         return new_image
 
     def validate_tags(self, value):
@@ -377,6 +484,30 @@ class ImagePostPutSerializer(ImageBaseCreateAndEditSerializer):
         return value
 
 
+class ImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for starting and resuming chunked uploads."""
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'filename', 'size', 'offset')
+        read_only_fields = ('id', 'offset')
+
+    def validate_filename(self, value):
+        extension = os.path.splitext(value)[1].lstrip('.').lower()
+        if extension not in settings.ALLOWED_EXTENSIONS:
+            raise serializers.ValidationError(
+                _('This file extension is not allowed.')
+            )
+        return value
+
+    def validate_size(self, value):
+        if value > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('The file is too large.')
+            )
+        return value
+
+
 class ImagePatchSerializer(ImageBaseCreateAndEditSerializer):
     """Custom serializer for Patch requests."""
 
@@ -402,7 +533,7 @@ class FavoriteSerialiser(serializers.ModelSerializer):
         read_only_fields = ('image', 'user',)
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for transferring and modifying user information."""
 
     username = serializers.CharField(required=False)
@@ -414,22 +545,14 @@ class UserSerializer(serializers.ModelSerializer):
 
     def get_count_my_images(self, obj):
         if (obj.role == 'Author'):
-            images = obj.images.all()
-            serializer = ImageShortSerializer(
-                images, many=True, context=self.context
-            )
-            return len(serializer.data)
+            return obj.images_count
 
     def get_my_subscribers(self, obj):
         if (obj.role == 'Author'):
-            queryset = Subscription.objects.filter(author=obj.id)
-            serializer = MySubscribers(queryset, many=True)
-            return len(serializer.data)
+            return obj.subscribers_count
 
     def get_my_subscriptions(self, obj):
-        queryset = Subscription.objects.filter(subscriber=obj.id)
-        serializer = MySubscribers(queryset, many=True)
-        return len(serializer.data)
+        return obj.subscriptions_count
 
     class Meta:
         model = User
@@ -5,18 +5,25 @@ from .schemas import schema_view
 from .views import (
     CustomProviderAuthView,
     CustomUserViewSet,
+    FeedViewSet,
+    ImageUploadViewSet,
     ImageViewSet,
     TagViewSet,
     auth_confirmation,
     auth_signup_post,
     get_token_post,
+    metrics,
     sign_out,
 )
 
 v1_router = DefaultRouter()
 v1_router.register('users', CustomUserViewSet)
 v1_router.register('image', ImageViewSet, basename='image')
+v1_router.register(
+    'image-uploads', ImageUploadViewSet, basename='image-uploads'
+)
 v1_router.register('tags', TagViewSet, basename='tags')
+v1_router.register('feed', FeedViewSet, basename='feed')
 
 auth_url = [
     path('signin/', get_token_post, name='signin'),
@@ -28,6 +35,7 @@ auth_url = [
 urlpatterns = [
     path('', include(v1_router.urls)),
     path('auth/', include(auth_url)),
+    path('metrics/', metrics, name='metrics'),
     path('auth/social/o/<str:provider>/', CustomProviderAuthView.as_view()),
     # path('auth/social/', include('djoser.social.urls')),
     # path('auth/', include('djoser.urls.jwt')),
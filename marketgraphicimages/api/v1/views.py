@@ -1,15 +1,24 @@
+import random
+
 from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
-from django.http import FileResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Value
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
-from djoser.compat import get_user_email
 from djoser.conf import settings as djoser_settings
 from djoser.social.views import ProviderAuthView
 from djoser.views import UserViewSet
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import filters, parsers, renderers, status, viewsets
+from rest_framework import (
+    filters,
+    mixins,
+    parsers,
+    renderers,
+    status,
+    viewsets,
+)
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import (
     AllowAny,
@@ -32,6 +41,7 @@ from api.v1.filters import ImageFilter
 from api.v1.serializers import (
     AuthSignInSerializer,
     AuthSignUpSerializer,
+    AuthorSerializer,
     BaseShortUserSerializer,
     ConfirmationSerializer,
     FavoriteSerialiser,
@@ -39,17 +49,45 @@ from api.v1.serializers import (
     ImagePatchSerializer,
     ImagePostPutSerializer,
     ImageShortSerializer,
+    ImageUploadSerializer,
     TagSerializer,
 )
+from core.authentication import get_user_cache_stats
+from core.conditional import conditional_get, make_etag
 from core.confirmation_code import send_email_with_confirmation_code
+from core.downloads import download_response
+from core.metrics import get_view_metrics
+from core.new_password_reset_email import send_password_reset_email
+from core.response_cache import (
+    IMAGES,
+    cache_anonymous_response,
+    get_generations,
+)
 from core.permissions import (
+    AdminPermission,
     IsAuthorOrAdminPermission,
     OwnerOrAdminPermission,
     OwnerPermission,
 )
-from core.paginator import PaginatorForImage
-from images.models import FavoriteImage, Image
+from core.paginator import (
+    CursorPaginatorForSubscription,
+    KeysetPaginator,
+    PaginationModeMixin,
+    PaginatorForImage,
+)
+from images.downloads import record_download
+from images.feed import get_feed_page
+from images.models import FavoriteImage, Image, ImageUpload
+from images.uploads import (
+    delete_upload,
+    open_upload,
+    start_upload,
+    write_chunk,
+)
+from jobs.queue import enqueue
+from tags.covers import get_tag_covers
 from tags.models import Tag
+from users.models import Subscription
 
 User = get_user_model()
 
@@ -139,6 +177,19 @@ def sign_out(request: Request) -> Response:
     return response
 
 
+@api_view(['GET'])
+@permission_classes([AdminPermission])
+def metrics(request: Request) -> Response:
+    """
+    Returns the histograms of the total, database and serializer time
+    of every view and the hits of the user cache in this process.
+    """
+    return Response({
+        'views': get_view_metrics(),
+        'user_cache': get_user_cache_stats(),
+    })
+
+
 class CustomUserViewSet(UserViewSet):
     """
     This viewset inherits from djoser `UserViewSet` and adds custom actions
@@ -159,7 +210,9 @@ class CustomUserViewSet(UserViewSet):
         return super().get_parsers()
 
     def get_permissions(self):
-        if self.action == 'reset_password_confirm_code':
+        if self.action in ('subscribe', 'subscribers', 'subscriptions'):
+            self.permission_classes = (IsAuthenticated,)
+        elif self.action == 'reset_password_confirm_code':
             self.permission_classes = (
                 djoser_settings.PERMISSIONS.password_reset_confirm_code
             )
@@ -192,9 +245,7 @@ class CustomUserViewSet(UserViewSet):
         user = serializer.get_user()
 
         if user:
-            context = {"user": user}
-            to = [get_user_email(user)]
-            djoser_settings.EMAIL.password_reset(self.request, context).send(to)
+            enqueue(send_password_reset_email, user_id=user.pk)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -242,6 +293,72 @@ class CustomUserViewSet(UserViewSet):
         user = get_object_or_404(User, pk=request.user.pk)
         return Response(self.get_serializer(user).data)
 
+    @action(('post', 'delete'), detail=True)
+    @swagger_auto_schema(
+            responses={201: AuthorSerializer, 204: 'No content',
+                       400: 'Bad request'})
+    def subscribe(self, request, *args, **kwargs):
+        """Subscribe to and unsubscribe from the user."""
+        author = self.get_object()
+        user = request.user
+        if request.method == 'POST':
+            try:
+                with transaction.atomic():
+                    Subscription.objects.create(
+                        user=user, subscriber=user, author=author
+                    )
+            except IntegrityError:
+                return Response(
+                    {'errors': _('You can not subscribe to yourself.')
+                     if author.pk == user.pk
+                     else _('You are already subscribed to the user.')},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            serializer = AuthorSerializer(
+                author, context=self.get_serializer_context()
+            )
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        with transaction.atomic():
+            deleted = Subscription.objects.filter(
+                subscriber=user, author=author
+            ).delete()[0]
+        if not deleted:
+            return Response(
+                {'errors': _('You are not subscribed to the user.')},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def list_subscription_users(self, subscriptions, user_field):
+        """Returns a cursor page of the users of the subscriptions."""
+        paginator = CursorPaginatorForSubscription()
+        page = paginator.paginate_queryset(
+            subscriptions.select_related(user_field), self.request, view=self
+        )
+        serializer = AuthorSerializer(
+            [getattr(subscription, user_field) for subscription in page],
+            many=True, context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(('get',), detail=True)
+    @swagger_auto_schema(responses={200: AuthorSerializer(many=True)})
+    def subscribers(self, request, *args, **kwargs):
+        """Users subscribed to the user, the latest first."""
+        return self.list_subscription_users(
+            Subscription.objects.filter(author=self.get_object()),
+            'subscriber',
+        )
+
+    @action(('get',), detail=True)
+    @swagger_auto_schema(responses={200: AuthorSerializer(many=True)})
+    def subscriptions(self, request, *args, **kwargs):
+        """Users the user is subscribed to, the latest first."""
+        return self.list_subscription_users(
+            Subscription.objects.filter(subscriber=self.get_object()),
+            'author',
+        )
+
     def activation(self, request, *args, **kwargs):
         pass
 
@@ -255,7 +372,7 @@ class CustomUserViewSet(UserViewSet):
         pass
 
 
-class ImageViewSet(viewsets.ModelViewSet):
+class ImageViewSet(PaginationModeMixin, viewsets.ModelViewSet):
     """ViewSet to work with instances of images."""
 
     queryset = Image.objects.all()
@@ -266,6 +383,11 @@ class ImageViewSet(viewsets.ModelViewSet):
     renderer_classes = (renderers.JSONRenderer,)
     pagination_class = PaginatorForImage
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Image.objects.with_is_favorited(self.request.user)
+        return super().get_queryset()
+
     def get_parsers(self):
         if self.request.method in ('POST', 'PUT', 'PATCH'):
             return (
@@ -300,6 +422,70 @@ class ImageViewSet(viewsets.ModelViewSet):
             return (OwnerPermission(),)
         return (IsAuthenticatedOrReadOnly(),)
 
+    def get_list_validators(self, request, *args, **kwargs):
+        """
+        Returns the ETag and Last-Modified of the page built from the
+        latest update of the filtered images. Creations and deletions
+        are seen through the generation of the cached image responses.
+        """
+        updated = self.filter_queryset(self.get_queryset()).order_by(
+        ).aggregate(updated=Max('updated'))['updated']
+        return make_etag(
+            request.user.id, request.get_full_path(),
+            get_generations(IMAGES), updated,
+        ), updated
+
+    def get_detail_validators(self, request, *args, **kwargs):
+        """
+        Returns the ETag and Last-Modified of the image, which also
+        depend on the recommended images and on the embedded author:
+        the subscription of the user to the author and the number of
+        the author's images.
+        """
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if request.user.is_authenticated:
+            is_subscribed = Exists(Subscription.objects.filter(
+                subscriber=request.user, author=OuterRef('author'),
+            ))
+        else:
+            is_subscribed = Value(False)
+        try:
+            images = Image.objects.filter(
+                **{self.lookup_field: self.kwargs[lookup]}
+            )
+        except (ValueError, TypeError):
+            # A malformed lookup is answered with 404 by the action.
+            return None, None
+        state = images.annotate(
+            recommended_count=Count('recommendedimage'),
+            recommended_updated=Max('recommendedimage__recommended__updated'),
+            is_subscribed=is_subscribed,
+            author_images_count=F('author__images_count'),
+        ).values(
+            'updated', 'recommended_count', 'recommended_updated',
+            'is_subscribed', 'author_images_count',
+        )
+        if not state:
+            return None, None
+        state = state[0]
+        return make_etag(
+            request.user.id, request.get_full_path(), state['updated'],
+            state['recommended_count'], state['recommended_updated'],
+            state['is_subscribed'], state['author_images_count'],
+        ), max(filter(None, (
+            state['updated'], state['recommended_updated']
+        )))
+
+    @cache_anonymous_response(IMAGES)
+    @conditional_get(get_list_validators)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_anonymous_response(IMAGES)
+    @conditional_get(get_detail_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -335,7 +521,8 @@ class ImageViewSet(viewsets.ModelViewSet):
         return Response(detail, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
-            responses={200: 'Ok', 403: 'Only free image can be downloaded.'})
+            responses={200: 'Ok', 206: 'Partial Content',
+                       403: 'Only free image can be downloaded.'})
     @action(detail=True, methods=('get',))
     def download(self, request, pk=None):
         """Download an image."""
@@ -344,13 +531,108 @@ class ImageViewSet(viewsets.ModelViewSet):
             return Response(
                 {"errors": _("Only free image can be downloaded.")},
                 status=status.HTTP_403_FORBIDDEN)
-        response = FileResponse(open(image.image.path, 'rb'))
-        response['Content-Disposition'] = (
-            'attachment; filename="%s"' % _(image.image.name))
-        response['Content-Length'] = image.image.size
-        if self.request.user.is_authenticated:
-            image.downloadimage_set.get_or_create(user=self.request.user)
-        return response
+        record_download(image.id, self.request.user.id)
+        return download_response(
+            image.image, request.headers.get('Range'))
+
+
+class ImageUploadViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    Uploads a large image in chunks: a client starts an upload, appends
+    the chunks to it, resuming from `offset` after a failure, and then
+    finalizes it into an image.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthorOrAdminPermission,)
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        start_upload(serializer.save(user=self.request.user))
+
+    def perform_destroy(self, instance):
+        delete_upload(instance)
+
+    @swagger_auto_schema(
+            responses={200: ImageUploadSerializer,
+                       400: 'The chunk is past the end of the file.',
+                       409: 'Upload-Offset does not match the offset.'})
+    @action(detail=True, methods=('put',), parser_classes=())
+    def chunk(self, request, pk=None):
+        """
+        Appends the request body to the upload. The `Upload-Offset`
+        header must be equal to the number of bytes received.
+        """
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=pk
+            )
+            if request.headers.get('Upload-Offset') != str(upload.offset):
+                return Response(
+                    self.get_serializer(upload).data,
+                    status=status.HTTP_409_CONFLICT)
+            try:
+                upload.offset = write_chunk(upload, request.stream)
+            except ValueError:
+                return Response(
+                    {"errors": _("The chunk is past the end of the file.")},
+                    status=status.HTTP_400_BAD_REQUEST)
+            upload.save(update_fields=('offset',))
+        return Response(self.get_serializer(upload).data)
+
+    @swagger_auto_schema(
+            request_body=ImagePostPutSerializer,
+            responses={201: ImageGetSerializer,
+                       400: 'The upload is not complete.'})
+    @action(detail=True, methods=('post',))
+    def finalize(self, request, pk=None):
+        """Creates an image from the complete upload."""
+        upload = self.get_object()
+        if upload.offset != upload.size:
+            return Response(
+                {"errors": _("The upload is not complete.")},
+                status=status.HTTP_400_BAD_REQUEST)
+        data = request.data.copy()
+        data['image'] = open_upload(upload)
+        serializer = ImagePostPutSerializer(
+            data=data, context=self.get_serializer_context()
+        )
+        try:
+            serializer.is_valid(raise_exception=True)
+            serializer.save(author=request.user)
+        finally:
+            data['image'].close()
+        delete_upload(upload)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class FeedViewSet(viewsets.GenericViewSet):
+    """Images of the authors the user is subscribed to, newest first."""
+
+    serializer_class = ImageShortSerializer
+    permission_classes = (IsAuthenticated, )
+    pagination_class = KeysetPaginator
+
+    def list(self, request, *args, **kwargs):
+        image_ids = self.paginator.paginate_keyset(
+            lambda position, limit: get_feed_page(
+                request.user, position, limit
+            ),
+            request,
+        )
+        images = Image.objects.with_is_favorited(request.user).in_bulk(
+            image_ids
+        )
+        serializer = self.get_serializer(
+            [images[image_id] for image_id in image_ids if image_id in images],
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -361,7 +643,30 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ['name', ]
 
     def get_queryset(self):
-        return Tag.objects.all().order_by('?')
+        return Tag.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Returns the tags in random order, each with a random cover image
+        picked from the cached pool of the tag.
+
+        The response is not cached, so that every request gets its own
+        order and covers.
+        """
+        tags = list(self.filter_queryset(self.get_queryset()))
+        random.shuffle(tags)
+        covers = get_tag_covers([tag.id for tag in tags])
+        images = Image.objects.with_is_favorited(request.user).in_bulk(
+            set(covers.values())
+        )
+        context = self.get_serializer_context()
+        context['tag_covers'] = {
+            tag_id: images[image_id]
+            for tag_id, image_id in covers.items()
+            if image_id in images
+        }
+        serializer = self.get_serializer(tags, many=True, context=context)
+        return Response(serializer.data)
 
 
 class CustomProviderAuthView(ProviderAuthView):
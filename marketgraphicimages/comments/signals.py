@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from comments.models import Comment
+from images.counters import change_counter
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    """Increments the comments counter of the image."""
+    if created:
+        change_counter(instance.commented_post_id, 'comments_count')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Decrements the comments counter of the image."""
+    change_counter(instance.commented_post_id, 'comments_count', -1)
@@ -1,5 +1,56 @@
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from core.transaction import on_commit_once
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_user_version_key(user_id) -> str:
+    return f'jwt_user_version:{user_id}'
+
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    Bumps the version of the cached user, so the next request loads
+    the user from the database.
+    """
+    key = get_user_version_key(user_id)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_cached_user_on_commit(user_id) -> None:
+    """
+    Drops the cached user now and once more after the commit, as
+    a request reading the user before the commit could cache the old
+    data under the new version.
+    """
+    invalidate_cached_user(user_id)
+    on_commit_once(
+        ('jwt_user', user_id), partial(invalidate_cached_user, user_id)
+    )
+
+
+def count_user_cache(result: str) -> None:
+    with _stats_lock:
+        _stats[result] += 1
+
+
+def get_user_cache_stats() -> dict:
+    """Returns hits and misses of the user cache in this process."""
+    with _stats_lock:
+        return dict(_stats)
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -44,3 +95,26 @@ class CookieJWTAuthentication(JWTAuthentication):
             str: The raw JWT token from the request cookies.
         """
         return request.COOKIES.get('jwt')
+
+    def get_user(self, validated_token):
+        """
+        Returns the user of the token from the cache, loading it from
+        the database for `JWT_USER_CACHE_TIMEOUT` seconds on a miss.
+
+        The key contains the version of the user, which is bumped when
+        the user is saved, so a stale user is never read.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+        version = cache.get(get_user_version_key(user_id), 0)
+        key = f'jwt_user:{user_id}:{version}'
+        user = cache.get(key)
+        if user is not None:
+            count_user_cache('hits')
+            return user
+        count_user_cache('misses')
+        user = super().get_user(validated_token)
+        cache.set(key, user, settings.JWT_USER_CACHE_TIMEOUT)
+        return user
@@ -1,11 +1,15 @@
+from datetime import timedelta
 from random import randint
 
 from django.conf import settings as django_settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
+from django.db import models
+from django.utils import timezone
 from rest_framework.request import Request
 
-from .encryption_str import hash_value
+from .encryption_str import hash_value, verify_value
+from jobs.queue import enqueue
 from users.models import ConfirmationCode
 
 User = get_user_model()
@@ -23,13 +27,23 @@ def create_six_digit_confirmation_code() -> str:
 
 def send_email_with_confirmation_code(request: Request) -> None:
     """
-    Sends an email with a confirmation code to the provided email address.
+    Queues an email with a confirmation code to the provided email address.
 
     Parameters:
     - request: The request object containing the email address.
     """
-    email = request.data.get("email")
-    confirmation_code = create_confirmation_code(request)
+    enqueue(send_confirmation_code, email=request.data.get("email"))
+
+
+def send_confirmation_code(email: str) -> None:
+    """
+    Creates a confirmation code and sends it to the email address.
+    Runs in a background job.
+
+    Parameters:
+    - email: The email address of the user.
+    """
+    confirmation_code = create_confirmation_code(email)
     send_mail(
         SUBJECT_EMAIL,
         f"{TEXT_EMAIL} = {confirmation_code}",
@@ -39,24 +53,23 @@ def send_email_with_confirmation_code(request: Request) -> None:
     )
 
 
-def create_confirmation_code(request: Request) -> str:
+def create_confirmation_code(email: str) -> str:
     """
-    Generates a confirmation code for a user based on the provided
-    request data.
+    Generates a confirmation code for a user with the provided email.
 
     Args:
-        request (Request): The HTTP request object containing the user's
-        username and email.
+        email (str): The user's email.
 
     Returns:
         str: The generated confirmation code.
     """
-    email = request.data.get("email")
     confirmation_code = create_six_digit_confirmation_code()
     confirmation_obj, _ = ConfirmationCode.objects.get_or_create(
         email=email,
     )
     confirmation_obj.confirmation_code = hash_value(confirmation_code)
+    confirmation_obj.created = timezone.now()
+    confirmation_obj.attempts = 0
     confirmation_obj.save()
     return confirmation_code
 
@@ -65,3 +78,35 @@ def user_confirmation_code_to_db(code: str, user: User) -> None:
     """The method encrypts confirmation code and writes it to the database."""
     user.code_owner.all().delete()
     user.code_owner.create(confirmation_code=hash_value(code))
+
+
+def is_code_expired(confirmation: models.Model) -> bool:
+    """Tells whether the code is older than `CONFIRMATION_CODE_LIFETIME`."""
+    return confirmation.created < timezone.now() - timedelta(
+        seconds=django_settings.CONFIRMATION_CODE_LIFETIME
+    )
+
+
+def check_confirmation_code(confirmation: models.Model, code: str) -> bool:
+    """
+    Checks the code against a stored confirmation code. Every check
+    counts as an attempt, so after `CONFIRMATION_CODE_MAX_ATTEMPTS`
+    checks and after expiry the code matches nothing.
+
+    Args:
+        confirmation: A `ConfirmationCode` or a `UserConfirmationCode`.
+        code (str): The code entered by the user.
+
+    Returns:
+        bool: Whether the code is valid.
+    """
+    if is_code_expired(confirmation):
+        return False
+    # The conditional update counts concurrent attempts too.
+    counted = type(confirmation).objects.filter(
+        pk=confirmation.pk,
+        attempts__lt=django_settings.CONFIRMATION_CODE_MAX_ATTEMPTS,
+    ).update(attempts=models.F('attempts') + 1)
+    return bool(counted) and verify_value(
+        code, confirmation.confirmation_code
+    )
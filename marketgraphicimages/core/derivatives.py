@@ -0,0 +1,84 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+
+from images.models import Image
+
+
+def render_derivative(file, size: tuple) -> ContentFile:
+    """
+    Renders a downscaled copy of an image that fits into `size`.
+
+    Args:
+        file: An image file.
+        size (tuple): Maximum width and height.
+
+    Returns:
+        ContentFile: The encoded copy in `IMAGE_DERIVATIVE_FORMAT`, or
+        None if Pillow cannot read the image (e.g. SVG) or refuses to
+        decode it as a decompression bomb.
+    """
+    img_format = settings.IMAGE_DERIVATIVE_FORMAT
+    file.seek(0)
+    try:
+        with PILImage.open(file) as image:
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(size)
+            has_alpha = (
+                'A' in image.getbands() or 'transparency' in image.info
+            )
+            image = image.convert(
+                'RGBA' if has_alpha and img_format != 'JPEG' else 'RGB'
+            )
+            buffer = io.BytesIO()
+            image.save(
+                buffer,
+                format=img_format,
+                quality=settings.IMAGE_DERIVATIVE_QUALITY,
+            )
+    except (
+        UnidentifiedImageError, OSError, PILImage.DecompressionBombError
+    ):
+        return None
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(image) -> None:
+    """
+    Generates the derivatives listed in `IMAGE_DERIVATIVES` for the image
+    and stores them next to the original.
+
+    Args:
+        image (images.models.Image): The image to generate derivatives for.
+    """
+    stem = os.path.splitext(os.path.basename(image.image.name))[0]
+    extension = settings.IMAGE_DERIVATIVE_FORMAT.lower()
+    update_fields = []
+    with image.image.open('rb') as file:
+        for field_name, size in settings.IMAGE_DERIVATIVES.items():
+            field = getattr(image, field_name)
+            if field:
+                field.delete(save=False)
+            content = render_derivative(file, size)
+            if content is not None:
+                field.save(
+                    f'{stem}_{field_name}.{extension}', content, save=False
+                )
+            else:
+                setattr(image, f'{field_name}_width', None)
+                setattr(image, f'{field_name}_height', None)
+            update_fields.extend((
+                field_name, f'{field_name}_width', f'{field_name}_height'
+            ))
+    image.save(update_fields=(*update_fields, 'updated'))
+
+
+def generate_image_derivatives(image_id: int) -> None:
+    """Generates derivatives of the image. Runs in a background job."""
+    image = Image.objects.filter(pk=image_id).first()
+    if image is not None:
+        generate_derivatives(image)
@@ -0,0 +1,117 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+ACCEL = 'accel'
+STREAM = 'stream'
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_content_disposition(filename: str) -> str:
+    """Returns the attachment header value for the file name."""
+    return content_disposition_header(True, os.path.basename(filename))
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single range of the `Range` header.
+
+    Returns:
+        tuple: The first and the last byte of the range, `None` when
+        the header is absent or malformed, so the whole file is sent.
+
+    Raises:
+        ValueError: The range does not overlap the file.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+def read_range(file, start: int, length: int):
+    """Yields `length` bytes of the file from `start` and closes it."""
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def accel_response(file) -> HttpResponse:
+    """
+    Hands the transfer of the file over to nginx: the body is empty and
+    the internal location in `X-Accel-Redirect` serves the file.
+    """
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = quote(
+        settings.IMAGE_DOWNLOAD_ACCEL_PREFIX + file.name
+    )
+    # Let nginx detect the type by the file extension.
+    del response['Content-Type']
+    response['Content-Disposition'] = get_content_disposition(file.name)
+    return response
+
+
+def stream_response(file, range_header: str = None) -> HttpResponse:
+    """Streams the file from the storage, honouring a single byte range."""
+    size = file.size
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(file.open('rb'))
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(file.open('rb'), start, end - start + 1),
+            status=206,
+            content_type=(
+                mimetypes.guess_type(file.name)[0]
+                or 'application/octet-stream'
+            ),
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        size = end - start + 1
+    response['Content-Length'] = size
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = get_content_disposition(file.name)
+    return response
+
+
+def download_response(file, range_header: str = None) -> HttpResponse:
+    """
+    Returns the response sending the file as an attachment in the
+    `IMAGE_DOWNLOAD_MODE` mode.
+
+    Args:
+        file: A `FieldFile` of the image.
+        range_header (str, optional): The `Range` header of the request.
+    """
+    if settings.IMAGE_DOWNLOAD_MODE == ACCEL:
+        return accel_response(file)
+    return stream_response(file, range_header)
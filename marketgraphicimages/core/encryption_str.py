@@ -1,13 +1,35 @@
+from django.utils.crypto import constant_time_compare, salted_hmac
 from passlib.context import CryptContext
 
+# Codes hashed before the HMAC scheme are still verified with bcrypt.
 pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
+HMAC_PREFIX = 'hmac-sha256$'
+HMAC_KEY_SALT = 'core.encryption_str.confirmation_code'
+
 
 def hash_value(value: str) -> str:
-    """Hashing value using multiple algorithms."""
-    return pwd_context.hash(value)
+    """
+    Hashes a short-lived confirmation code with an HMAC keyed by
+    `SECRET_KEY`. Without the key a leaked hash can not be brute forced,
+    so the slow bcrypt is not needed.
+    """
+    return HMAC_PREFIX + salted_hmac(
+        HMAC_KEY_SALT, value, algorithm='sha256'
+    ).hexdigest()
 
 
 def verify_value(value: str, hash_value: str) -> bool:
-    """Verifying value using multiple algorithms."""
-    return pwd_context.verify(value, hash_value)
+    """
+    Verifies the value against an HMAC in constant time or, for codes
+    stored before the HMAC scheme, against a bcrypt hash.
+    """
+    if hash_value.startswith(HMAC_PREFIX):
+        return constant_time_compare(
+            salted_hmac(HMAC_KEY_SALT, value, algorithm='sha256').hexdigest(),
+            hash_value[len(HMAC_PREFIX):],
+        )
+    try:
+        return pwd_context.verify(value, hash_value)
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,70 @@
+import os
+import re
+
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+
+SVG_PATTERN = re.compile(rb'^\s*(<\?xml[^>]*>\s*)?(<!--.*?-->\s*)*'
+                         rb'(<!DOCTYPE svg[^>]*>\s*)?<svg[\s>]', re.DOTALL)
+SNIFF_SIZE = 2048
+
+RASTER = 'raster'
+VECTOR = 'vector'
+GIF = 'gif'
+
+# File extensions of the Pillow formats whose names differ from them,
+# the first one is used for files with a wrong extension.
+FORMAT_EXTENSIONS = {
+    'JPEG': ('JPG', 'JPEG', 'JPE'),
+    # Multi-picture JPEGs of phone cameras.
+    'MPO': ('JPG', 'JPEG', 'JPE'),
+    'TIFF': ('TIFF', 'TIF'),
+}
+
+
+def get_extension(img_format: str, name: str) -> str:
+    """
+    Returns the extension of the file, as it was shown before the
+    format was detected, if it matches the detected format, and the
+    usual extension of the format otherwise.
+    """
+    extensions = FORMAT_EXTENSIONS.get(img_format, (img_format,))
+    extension = os.path.splitext(name)[1].lstrip('.').upper()
+    return extension if extension in extensions else extensions[0]
+
+
+def detect_image_format(file: File) -> tuple:
+    """
+    Detects the format of an image from the contents of the file.
+
+    Args:
+        file (File): An image file.
+
+    Returns:
+        tuple: The category (raster, vector or gif) and the upper-case
+        extension of the image, e.g. ('raster', 'JPG'). Formats Pillow
+        cannot read and images over the decompression bomb limit fall
+        back to the file extension.
+    """
+    position = file.tell() if hasattr(file, 'tell') else 0
+    try:
+        file.seek(0)
+        if SVG_PATTERN.match(file.read(SNIFF_SIZE)):
+            return VECTOR, 'SVG'
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                img_format = image.format
+        except (
+            UnidentifiedImageError, OSError, Image.DecompressionBombError
+        ):
+            img_format = None
+    finally:
+        file.seek(position)
+    if img_format is None:
+        img_format = os.path.splitext(file.name)[1].lstrip('.').upper()
+        if img_format == 'SVG':
+            return VECTOR, img_format
+    if img_format == 'GIF':
+        return GIF, img_format
+    return RASTER, get_extension(img_format, file.name)
@@ -1,26 +1,60 @@
 import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
 
+import requests
 from django.conf import settings
 from django.core.files.images import ImageFile
-from google_images_search import GoogleImagesSearch
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from core.image_format import VECTOR, detect_image_format
 
-def get_img_from_google(search_name: str = 'Природа', num_images: int = 10):
+MAX_RESULTS_PER_REQUEST = 10
+
+
+def get_session() -> requests.Session:
+    """
+    Creates an HTTP session reusing connections between the import
+    threads and retrying failed requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=settings.IMAGE_IMPORT_THREADS,
+        pool_maxsize=settings.IMAGE_IMPORT_THREADS,
+        max_retries=Retry(
+            total=3, backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_img_from_google(
+    session: requests.Session,
+    search_name: str = 'Природа',
+    num_images: int = 10,
+) -> list:
     """
-    Fetches images from Google Images using the Google Images Search API.
+    Searches Google Images with the Custom Search JSON API at
+    `GOOGLE_SEARCH_URL`.
 
     Args:
+        session (requests.Session): The HTTP session.
         search_name (str, optional): The search query for images.
-        num_images (int, optional): The number of images to fetch.
+        num_images (int, optional): The number of images to find.
 
     Returns:
-        GoogleImagesSearch: An instance of the GoogleImagesSearch class
-        with search results.
+        list: Links to the found images.
     """
     if (
-        num_images < 1 or not isinstance(search_name, str)
-        or not isinstance(num_images, int)
+        not isinstance(search_name, str)
+        or not isinstance(num_images, int) or num_images < 1
     ):
         raise ValueError("Invalid input data")
 
@@ -30,68 +64,114 @@ def get_img_from_google(search_name: str = 'Природа', num_images: int = 1
     ):
         raise ValueError("Invalid Google API key or project CX")
 
-    API_KEY = settings.GOOGLE_API_KEY
-    PROJECT_CX = settings.GOOGLE_PROJECT_CX
-    gis = GoogleImagesSearch(API_KEY, PROJECT_CX)
-
-    _search_params = {
-        'q': search_name,
-        'num': num_images,
-    }
-
-    gis.search(search_params=_search_params)
-    return gis
-
-
-def get_image_data(image) -> tuple:
+    links = []
+    while len(links) < num_images:
+        response = session.get(
+            settings.GOOGLE_SEARCH_URL,
+            params={
+                'key': settings.GOOGLE_API_KEY,
+                'cx': settings.GOOGLE_PROJECT_CX,
+                'q': search_name,
+                'searchType': 'image',
+                'num': min(
+                    num_images - len(links), MAX_RESULTS_PER_REQUEST
+                ),
+                'start': len(links) + 1,
+            },
+            timeout=settings.IMAGE_IMPORT_TIMEOUT,
+        )
+        response.raise_for_status()
+        items = response.json().get('items', [])
+        links.extend(item['link'] for item in items)
+        if len(items) < MAX_RESULTS_PER_REQUEST:
+            break
+    return links[:num_images]
+
+
+def get_image_name(url: str) -> str:
+    """Returns the file name from the path of the image link."""
+    return os.path.basename(unquote(urlparse(url).path)) or 'image'
+
+
+def get_img_file(session: requests.Session, url: str) -> ImageFile:
     """
-    Extracts image data such as the file name and format
-    from a Google Images Search result.
+    Downloads the image. Files of an allowed format are kept byte for
+    byte, only other formats Pillow can read are converted to PNG.
 
     Args:
-        image: A Google Images Search result image.
+        session (requests.Session): The HTTP session.
+        url (str): The link to the image.
 
     Returns:
-        tuple: A tuple containing the file name (str) and image format (str).
+        ImageFile: The downloaded image, `None` if it is not an image.
     """
-    splitted_name = image.url.split('/')[-1]
-    img_format = splitted_name.split('.')[-1]
-    img_format = 'JPEG' if img_format.lower() == 'jpg' else img_format
-    return splitted_name, img_format
+    response = session.get(url, timeout=settings.IMAGE_IMPORT_TIMEOUT)
+    response.raise_for_status()
+    content = io.BytesIO(response.content)
+    content.name = get_image_name(url)
+    stem = os.path.splitext(content.name)[0]
+    if detect_image_format(content)[0] == VECTOR:
+        return ImageFile(content, name=f'{stem}.svg')
+    try:
+        # Opening reads only the header, the pixels are decoded
+        # only for the conversion.
+        with Image.open(content) as image:
+            extension = (
+                'jpg' if image.format == 'JPEG' else image.format.lower()
+            )
+            if extension in settings.ALLOWED_EXTENSIONS:
+                content.seek(0)
+                return ImageFile(content, name=f'{stem}.{extension}')
+            converted = io.BytesIO()
+            image.save(converted, format='PNG')
+    except (
+        UnidentifiedImageError, OSError, Image.DecompressionBombError
+    ):
+        return None
+    return ImageFile(converted, name=f'{stem}.png')
 
 
-def open_image(image) -> Image:
+def search_images(session: requests.Session, queries, num_images: int):
     """
-    Opens and returns an image from a Google Images Search result.
-
-    Args:
-        image: A Google Images Search result image.
+    Runs the searches in `IMAGE_IMPORT_THREADS` threads.
 
-    Returns:
-        Image: An Image object representing the image.
+    Yields:
+        tuple: The query and the list of found links.
     """
-    my_bytes_io = io.BytesIO()
-    my_bytes_io.seek(0)
-    raw_image_data = image.get_raw_data()
-    image.copy_to(my_bytes_io, raw_image_data)
-    image.copy_to(my_bytes_io)
-    my_bytes_io.seek(0)
-    return Image.open(my_bytes_io)
+    def search(query):
+        return query, get_img_from_google(session, query, num_images)
 
+    with ThreadPoolExecutor(
+        max_workers=settings.IMAGE_IMPORT_THREADS
+    ) as pool:
+        yield from pool.map(search, queries)
 
-def get_img_file(image) -> ImageFile:
+
+def fetch_images(session: requests.Session, urls):
     """
-    Saves an image from a Google Images Search result to a BytesIO stream
-    and returns it as an ImageFile.
+    Downloads the images in `IMAGE_IMPORT_THREADS` threads.
 
-    Args:
-        image: A Google Images Search result image.
+    At most `IMAGE_IMPORT_THREADS` downloads are submitted ahead of the
+    consumer, so only as many files are held in memory however many
+    links there are.
 
-    Returns:
-        ImageFile: An ImageFile object representing the image in a BytesIO.
+    Yields:
+        tuple: The link and the downloaded file, `None` for links that
+        failed, in the order of `urls`.
     """
-    my_bytes_io = io.BytesIO()
-    temp_img = open_image(image)
-    splitted_name, img_format = get_image_data(image)
-    temp_img.save(my_bytes_io, format=img_format)
-    return ImageFile(my_bytes_io, name=splitted_name)
+    def fetch(url):
+        try:
+            return url, get_img_file(session, url)
+        except requests.RequestException:
+            return url, None
+
+    pending = deque()
+    with ThreadPoolExecutor(
+        max_workers=settings.IMAGE_IMPORT_THREADS
+    ) as pool:
+        for url in urls:
+            if len(pending) >= settings.IMAGE_IMPORT_THREADS:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fetch, url))
+        while pending:
+            yield pending.popleft().result()
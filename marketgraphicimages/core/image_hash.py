@@ -0,0 +1,103 @@
+from django.core.files import File
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+HASH_SIZE = 8
+
+
+def compute_dhash(file: File) -> str:
+    """
+    Computes the 64-bit difference hash of an image: every bit tells
+    whether a pixel of the grayscale 9x8 thumbnail is brighter than its
+    right neighbour, so resized and recompressed copies get close hashes.
+
+    The hash is remembered on the file object, so an upload is hashed
+    once during validation and saving.
+
+    Args:
+        file (File): An image file.
+
+    Returns:
+        str: The hash as 16 hex digits, an empty string for files
+        Pillow can not read or refuses to open as decompression bombs.
+    """
+    if hasattr(file, 'dhash'):
+        return file.dhash
+    position = file.tell() if hasattr(file, 'tell') else 0
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            image.draft('L', (HASH_SIZE * 4, HASH_SIZE * 4))
+            image = ImageOps.exif_transpose(image).convert('L').resize(
+                (HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS
+            )
+            pixels = list(image.getdata())
+    except (
+        UnidentifiedImageError, OSError, Image.DecompressionBombError
+    ):
+        dhash = ''
+    else:
+        value = 0
+        for row in range(HASH_SIZE):
+            for col in range(HASH_SIZE):
+                left = pixels[row * (HASH_SIZE + 1) + col]
+                value = value << 1 | (left > pixels[
+                    row * (HASH_SIZE + 1) + col + 1
+                ])
+        dhash = f'{value:016x}'
+    finally:
+        file.seek(position)
+    file.dhash = dhash
+    return dhash
+
+
+def hamming_distance(first: str, second: str) -> int:
+    """Returns the number of different bits of two hex hashes."""
+    return (int(first, 16) ^ int(second, 16)).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree of hashes for the search of hashes within
+    a Hamming distance without comparing with every hash.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, dhash: str, item) -> None:
+        """Adds the item under the hash. Equal hashes share a node."""
+        if self.root is None:
+            self.root = (dhash, {item}, {})
+            return
+        node = self.root
+        while True:
+            node_hash, items, children = node
+            distance = hamming_distance(dhash, node_hash)
+            if distance == 0:
+                items.add(item)
+                return
+            if distance not in children:
+                children[distance] = (dhash, {item}, {})
+                return
+            node = children[distance]
+
+    def search(self, dhash: str, max_distance: int) -> list:
+        """
+        Returns (distance, hash, items) of the nodes within
+        `max_distance` of the hash, closest first.
+        """
+        if self.root is None:
+            return []
+        found = []
+        nodes = [self.root]
+        while nodes:
+            node_hash, items, children = nodes.pop()
+            distance = hamming_distance(dhash, node_hash)
+            if distance <= max_distance:
+                found.append((distance, node_hash, items))
+            # By the triangle inequality only these subtrees can hold
+            # hashes within `max_distance`.
+            for child_distance, child in children.items():
+                if abs(child_distance - distance) <= max_distance:
+                    nodes.append(child)
+        return sorted(found, key=lambda result: result[0])
@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from core.confirmation_code import create_six_digit_confirmation_code
+from core.encryption_str import hash_value, pwd_context, verify_value
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the hashing of confirmation codes with HMAC and with the '
+        'former bcrypt. A signup hashes a code once and verifies it once; '
+        'the throughput is measured in one thread, so it is per core.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--signups', type=int, default=1000)
+        parser.add_argument('--bcrypt-signups', type=int, default=20)
+
+    def measure(self, hash_code, signups: int) -> list:
+        timings = []
+        for _ in range(signups):
+            code = create_six_digit_confirmation_code()
+            start = time.perf_counter()
+            verified = verify_value(code, hash_code(code))
+            timings.append((time.perf_counter() - start) * 1000)
+            if not verified:
+                raise CommandError('The code does not match its hash.')
+        return timings
+
+    def report(self, name: str, timings: list) -> None:
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        mean = statistics.mean(timings)
+        print(
+            f'{name}: mean {mean:.3f} ms, '
+            f'p50 {statistics.median(timings):.3f} ms, p95 {p95:.3f} ms, '
+            f'{1000 / mean:.0f} signups/s per core'
+        )
+
+    def handle(self, *args, **options):
+        self.report('hmac', self.measure(hash_value, options['signups']))
+        self.report(
+            'bcrypt',
+            self.measure(pwd_context.hash, options['bcrypt_signups']),
+        )
@@ -1,17 +1,31 @@
+import os
 import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.core.files.images import ImageFile
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 from django.db.utils import IntegrityError
 from tqdm import tqdm
 
-from core.image_from_google import get_img_file, get_img_from_google
-from images.models import Image
+from core.image_format import RASTER
+from core.image_from_google import fetch_images, get_session, search_images
+from core.response_cache import IMAGES, bump_generation
+from core.synthetic import render_synthetic_image
+from images.models import DownloadImage, FavoriteImage, Image, TagImage
+from images.search import index_search_documents
 from tags.models import Tag
+from users.counters import recount_user_counters
+from users.models import Subscription
 
 User = get_user_model()
 
+NAME_LENGTH = Image._meta.get_field('name').max_length
+
 tags = {
     'Природа': 'nature',
     'Путешествия': 'trevels',
@@ -64,6 +78,27 @@ users = (
 
 
 class Command(BaseCommand):
+    help = (
+        'Loads test data: images found by Google or, with --synthetic, '
+        'a generated catalog of any size that needs no network.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--synthetic', action='store_true',
+            help='Generate procedural images instead of searching Google.',
+        )
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--images', type=int, default=1000)
+        parser.add_argument('--tags-per-image', type=int, default=3)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--downloads-per-user', type=int, default=10)
+        parser.add_argument('--subscriptions-per-user', type=int, default=5)
+        parser.add_argument('--image-size', type=int, default=256)
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--images-per-query', type=int, default=5)
 
     def create_tags(self) -> None:
         """
@@ -103,15 +138,15 @@ class Command(BaseCommand):
         Create image.
         """
         try:
-            new_image, _ = Image.objects.get_or_create(
-                author=user,
-                name=name,
-                license='free',
-                price=0,
-                image=image,
-            )
-            new_image.tags.set(tags)
-            new_image.save()
+            with transaction.atomic():
+                new_image = Image.objects.create(
+                    author=user,
+                    name=name,
+                    license='free',
+                    price=0,
+                    image=image,
+                )
+                new_image.tags.set(tags)
             return new_image
         except IntegrityError:
             pass
@@ -124,7 +159,7 @@ class Command(BaseCommand):
         Returns:
             list: A list of search parameters.
         """
-        name = tags.keys()
+        name = list(tags)
         params = []
         for i in range(2, max_tags_in_one_name):
             for _ in range(count_name):
@@ -132,25 +167,219 @@ class Command(BaseCommand):
                 params.append(' '.join(search_name))
         return params
 
-    def handle(self, *args, **kwargs):
+    def create_synthetic_users(self, options: dict) -> list:
+        """Bulk creates authors sharing one password hash."""
+        password = make_password('synthetic')
+        prefix = f'synthetic{options["seed"]}_'
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{prefix}{num}',
+                    email=f'{prefix}{num}@pictura.ru',
+                    password=password,
+                    role='Author',
+                )
+                for num in range(options['users'])
+            ),
+            batch_size=options['batch_size'],
+            ignore_conflicts=True,
+        )
+        return list(
+            User.objects.filter(
+                username__startswith=prefix
+            ).order_by('id').values_list('id', 'username')[:options['users']]
+        )
+
+    def render_synthetic_images(self, options: dict, prefix: str) -> list:
+        """Renders the pictures in a process pool and returns their hashes."""
+        tasks = [
+            (
+                options['seed'], num, options['image_size'],
+                os.path.join(settings.MEDIA_ROOT, f'{prefix}{num}.png'),
+            )
+            for num in range(options['images'])
+        ]
+        with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+            return list(tqdm(
+                pool.map(render_synthetic_image, tasks, chunksize=64),
+                total=len(tasks), desc='Rendering images', colour='green',
+            ))
+
+    def sample_pairs(self, rnd, users: list, targets: list, count: int,
+                     exclude_self: bool = False) -> list:
+        """
+        Picks `count` distinct targets for every user, other than the user
+        itself with `exclude_self`.
+        """
+        pairs = []
+        for user_id, _ in users:
+            picked = rnd.sample(
+                targets, min(count + exclude_self, len(targets))
+            )
+            if exclude_self:
+                picked = [target for target in picked if target != user_id]
+            pairs.extend((user_id, target) for target in picked[:count])
+        return pairs
+
+    def load_synthetic(self, options: dict) -> None:
+        """
+        Generates a catalog of procedural images with tags, favorites,
+        downloads and subscriptions, inserted with batched `bulk_create`.
+        The same seed produces the same catalog.
+        """
+        rnd = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = f'images/synthetic/{options["seed"]}/'
+        if Image.objects.filter(image__startswith=prefix).exists():
+            raise CommandError(
+                f'Synthetic images with seed {options["seed"]} are '
+                'already loaded.'
+            )
+        self.create_tags()
+        tag_names = dict(Tag.objects.values_list('id', 'name'))
+        tag_ids = sorted(tag_names)
+        users = self.create_synthetic_users(options)
+        usernames = dict(users)
+        hashes = self.render_synthetic_images(options, prefix)
+
+        authors = [rnd.choice(users)[0] for _ in hashes]
+        image_tags = [
+            rnd.sample(tag_ids, min(options['tags_per_image'], len(tag_ids)))
+            for _ in hashes
+        ]
+        indexes = range(len(hashes))
+        favorites = self.sample_pairs(
+            rnd, users, indexes, options['favorites_per_user']
+        )
+        downloads = self.sample_pairs(
+            rnd, users, indexes, options['downloads_per_user']
+        )
+        subscriptions = self.sample_pairs(
+            rnd, users, [user_id for user_id, _ in users],
+            options['subscriptions_per_user'], exclude_self=True,
+        )
+        favorites_count = Counter(index for _, index in favorites)
+        downloads_count = Counter(index for _, index in downloads)
+
+        with transaction.atomic():
+            images = []
+            for num, dhash in enumerate(hashes):
+                name = f'Synthetic {options["seed"]}-{num}'
+                images.append(Image(
+                    author_id=authors[num],
+                    name=name,
+                    image=f'{prefix}{num}.png',
+                    license=Image.LicenseType.FREE,
+                    price=0,
+                    category=RASTER,
+                    extension='PNG',
+                    dhash=dhash,
+                    favorites_count=favorites_count[num],
+                    downloads_count=downloads_count[num],
+                    search_document=' '.join((
+                        name,
+                        *(tag_names[tag_id] for tag_id in image_tags[num]),
+                        usernames[authors[num]],
+                    )),
+                ))
+            for start in tqdm(
+                range(0, len(images), batch_size),
+                desc='Inserting images', colour='green',
+            ):
+                batch = Image.objects.bulk_create(
+                    images[start:start + batch_size]
+                )
+                index_search_documents(batch)
+            image_ids = [image.id for image in images]
+            TagImage.objects.bulk_create(
+                (
+                    TagImage(image_id=image_ids[num], tag_id=tag_id)
+                    for num, tags in enumerate(image_tags)
+                    for tag_id in tags
+                ),
+                batch_size=batch_size,
+            )
+            FavoriteImage.objects.bulk_create(
+                (
+                    FavoriteImage(user_id=user_id, image_id=image_ids[num])
+                    for user_id, num in favorites
+                ),
+                batch_size=batch_size,
+            )
+            DownloadImage.objects.bulk_create(
+                (
+                    DownloadImage(user_id=user_id, image_id=image_ids[num])
+                    for user_id, num in downloads
+                ),
+                batch_size=batch_size,
+            )
+            Subscription.objects.bulk_create(
+                (
+                    Subscription(
+                        user_id=user_id, subscriber_id=user_id,
+                        author_id=author_id,
+                    )
+                    for user_id, author_id in subscriptions
+                ),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            recount_user_counters(
+                User.objects.filter(id__in=[user_id for user_id, _ in users])
+            )
+        bump_generation(IMAGES)
+        print(
+            'Done! Run rebuild_recommendations, rebuild_timelines and '
+            'generate_image_derivatives to fill the derived data.'
+        )
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            self.load_synthetic(options)
+            return
 
+        # The same seed repeats the searches, so an interrupted import
+        # resumes with the images that are not imported yet.
+        random.seed(options['seed'])
         self.create_tags()
         self.create_users()
-        users = User.objects.filter(username__in=users_pool)
+        users = list(User.objects.filter(username__in=users_pool))
+        tag_by_name = {tag.name: tag for tag in Tag.objects.all()}
         search_params = self.search_params(7, 6)
-        created_img = []
-        for search_name in tqdm(
-            search_params, desc='Creating images', colour='green'
-        ):
-            tags = Tag.objects.filter(name__in=search_name.split())
-            images = get_img_from_google(search_name=search_name, num_images=5)
-            for image in images.results():
-                image_file = get_img_file(image)
-                image_model = self.create_image(
+        url_queries = {}
+        with get_session() as session:
+            for search_name, urls in tqdm(
+                search_images(
+                    session, search_params, options['images_per_query']
+                ),
+                total=len(search_params),
+                desc='Searching images', colour='green',
+            ):
+                for url in urls:
+                    url_queries.setdefault(url, search_name)
+            # Images are named by their links.
+            imported = set(
+                Image.objects.filter(
+                    name__in=[url[:NAME_LENGTH] for url in url_queries]
+                ).values_list('name', flat=True)
+            )
+            urls = [
+                url for url in url_queries
+                if url[:NAME_LENGTH] not in imported
+            ]
+            for url, image_file in tqdm(
+                fetch_images(session, urls), total=len(urls),
+                desc='Creating images', colour='green',
+            ):
+                if image_file is None:
+                    continue
+                self.create_image(
                     user=random.choice(users),
-                    name=image.url,
+                    name=url[:NAME_LENGTH],
                     image=image_file,
-                    tags=tags,
+                    tags=[
+                        tag_by_name[name]
+                        for name in url_queries[url].split()
+                    ],
                 )
-                created_img.append(image_model)
         print('Done!')
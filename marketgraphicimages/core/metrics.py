@@ -0,0 +1,121 @@
+import contextvars
+import threading
+import time
+from collections import Counter
+
+# Upper bounds of the histogram buckets in milliseconds.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+current_metrics = contextvars.ContextVar('current_metrics', default=None)
+in_serializer = contextvars.ContextVar('in_serializer', default=False)
+
+_histograms_lock = threading.Lock()
+_histograms = {}
+
+
+class RequestMetrics:
+    """Database and serializer time of the request being processed."""
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = Counter()
+
+    @property
+    def query_count(self) -> int:
+        return sum(self.queries.values())
+
+    @property
+    def duplicate_query_count(self) -> int:
+        """
+        Counts the queries repeating the SQL of an earlier query with
+        other parameters, as an N+1 loop does.
+        """
+        return self.query_count - len(self.queries)
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Times the query, see `connection.execute_wrapper`."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries[sql] += 1
+
+
+class TimedSerializerMixin:
+    """
+    Adds the time of the representation to the metrics of the request.
+    Nested serializers are counted within the outermost one.
+    """
+
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None or in_serializer.get():
+            return super().to_representation(instance)
+        token = in_serializer.set(True)
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            in_serializer.reset(token)
+
+
+def make_histogram() -> dict:
+    return {
+        'count': 0,
+        'sum_ms': 0.0,
+        'buckets': {str(bound): 0 for bound in BUCKETS_MS + ('+Inf',)},
+    }
+
+
+def observe(histogram: dict, value_ms: float) -> None:
+    histogram['count'] += 1
+    histogram['sum_ms'] += value_ms
+    bound = next(
+        (bound for bound in BUCKETS_MS if value_ms <= bound), '+Inf'
+    )
+    histogram['buckets'][str(bound)] += 1
+
+
+def record_view_metrics(view_name: str, values: dict) -> None:
+    """
+    Adds the timings of a request to the histograms of the view.
+
+    Args:
+        view_name (str): The name of the view.
+        values (dict): Times in milliseconds and query counts.
+    """
+    with _histograms_lock:
+        stats = _histograms.setdefault(view_name, {
+            'total_ms': make_histogram(),
+            'db_ms': make_histogram(),
+            'serializer_ms': make_histogram(),
+            'queries': 0,
+            'duplicate_queries': 0,
+        })
+        for name in ('total_ms', 'db_ms', 'serializer_ms'):
+            observe(stats[name], values[name])
+        stats['queries'] += values['queries']
+        stats['duplicate_queries'] += values['duplicate_queries']
+
+
+def get_view_metrics() -> dict:
+    """Returns the histograms of the views in this process."""
+    with _histograms_lock:
+        return {
+            view_name: {
+                name: (
+                    {**value, 'buckets': dict(value['buckets'])}
+                    if isinstance(value, dict) else value
+                )
+                for name, value in stats.items()
+            }
+            for view_name, stats in _histograms.items()
+        }
+
+
+def reset_view_metrics() -> None:
+    with _histograms_lock:
+        _histograms.clear()
@@ -0,0 +1,63 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core.metrics import RequestMetrics, current_metrics, record_view_metrics
+
+logger = logging.getLogger('main')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures the database time, the number of all and of repeated
+    queries, the serializer time and the total time of every request.
+
+    The measurements are sent in the `Server-Timing` header, written to
+    the log as JSON and added to the histograms of the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        total_time = time.perf_counter() - start
+
+        values = {
+            'total_ms': round(total_time * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+            'queries': metrics.query_count,
+            'duplicate_queries': metrics.duplicate_query_count,
+        }
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={values["db_ms"]};desc="queries={values["queries"]} '
+            f'duplicates={values["duplicate_queries"]}"',
+            f'serializer;dur={values["serializer_ms"]}',
+            f'total;dur={values["total_ms"]}',
+        ))
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        record_view_metrics(view_name, values)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            **values,
+        }))
+        return response
@@ -1,3 +1,6 @@
+from django.contrib.auth import get_user_model
+from djoser.compat import get_user_email
+from djoser.conf import settings as djoser_settings
 from templated_mail.mail import BaseEmailMessage
 
 from .confirmation_code import (
@@ -5,6 +8,8 @@ from .confirmation_code import (
     user_confirmation_code_to_db,
 )
 
+User = get_user_model()
+
 
 class PasswordResetEmail(BaseEmailMessage):
     """Sends a confirmation code to the user.
@@ -17,3 +22,11 @@ class PasswordResetEmail(BaseEmailMessage):
         context["token"] = create_six_digit_confirmation_code()
         user_confirmation_code_to_db(context["token"], user)
         return context
+
+
+def send_password_reset_email(user_id: int) -> None:
+    """Sends the password reset email. Runs in a background job."""
+    user = User.objects.get(pk=user_id)
+    djoser_settings.EMAIL.password_reset(None, {'user': user}).send(
+        [get_user_email(user)]
+    )
@@ -1,6 +1,150 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db import connections
+from django.utils.translation import gettext_lazy as _
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PaginatorForImage(pagination.PageNumberPagination):
     page_size_query_param = 'limit'
     max_page_size = 1000
+
+
+class CursorPaginatorForImage(pagination.CursorPagination):
+    """
+    Keyset pagination over `(-created, id)` with opaque cursors.
+
+    Does not count the rows unless `count=exact` or `count=estimate`
+    is passed in the query string.
+    """
+    ordering = ('-created', 'id')
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = self.get_count(
+            queryset, request.query_params.get(self.count_query_param)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset, mode):
+        """Returns the exact or the estimated number of rows, if asked."""
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            if connections[queryset.db].vendor == 'postgresql':
+                plan = json.loads(queryset.order_by().explain(format='json'))
+                return plan[0]['Plan']['Plan Rows']
+            return queryset.count()
+        return None
+
+    def get_paginated_response(self, data):
+        response = OrderedDict((
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ))
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+
+class CursorPaginatorForSubscription(CursorPaginatorForImage):
+    """Keyset pagination of subscriptions, the latest first."""
+    ordering = ('-id',)
+
+
+class KeysetPaginator(pagination.BasePagination):
+    """
+    Forward-only keyset pagination of pages the view builds itself from
+    the `(created, id)` position of the last row of the previous page.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_keyset(self, get_page, request):
+        """
+        Returns the rows of the requested page.
+
+        Args:
+            get_page: A function taking the position and the page size
+                and returning the rows and the position of the next page.
+            request: The request.
+        """
+        self.request = request
+        rows, self.next_position = get_page(
+            self.decode_cursor(request), self.get_page_size(request)
+        )
+        return rows
+
+    def get_page_size(self, request) -> int:
+        try:
+            return pagination._positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True, cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request) -> tuple:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            created, pk = b64decode(
+                encoded.encode('ascii'), altchars=b'-_', validate=True
+            ).decode('ascii').split(' ')
+            return datetime.fromisoformat(created), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: tuple) -> str:
+        created, pk = position
+        return b64encode(
+            f'{created.isoformat()} {pk}'.encode('ascii'), altchars=b'-_'
+        ).decode('ascii')
+
+    def get_next_link(self) -> str:
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict((
+            ('next', self.get_next_link()),
+            ('results', data),
+        )))
+
+
+class PaginationModeMixin:
+    """
+    Chooses the cursor pagination when the request asks for it with
+    `pagination=cursor` or passes a cursor.
+    """
+    cursor_pagination_class = CursorPaginatorForImage
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if (params.get('pagination') == 'cursor'
+                    or self.cursor_pagination_class.cursor_query_param
+                    in params):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
@@ -36,3 +36,9 @@ class CurrentUserOrReadOnlyOrAdmin(permissions.BasePermission):
                 or obj.pk == user.pk
                 or request.method == 'GET'
                 )
+
+
+class AdminPermission(permissions.BasePermission):
+    """Only admin."""
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
@@ -0,0 +1,105 @@
+from functools import partial, wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.transaction import on_commit_once
+
+IMAGES = 'images'
+
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def get_generation_key(scope: str) -> str:
+    return f'response_generation:{scope}'
+
+
+def get_generations(*scopes: str) -> str:
+    """Returns the generations of the scopes joined with dots."""
+    generations = cache.get_many(
+        [get_generation_key(scope) for scope in scopes]
+    )
+    return '.'.join(
+        str(generations.get(get_generation_key(scope), 0))
+        for scope in scopes
+    )
+
+
+def bump_generation(scope: str) -> None:
+    """Makes all the cached responses of the scope stale."""
+    key = get_generation_key(scope)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def invalidate_responses(*scopes: str) -> None:
+    """
+    Makes the cached responses of the scopes stale once the current
+    transaction commits, so the old data is not cached again.
+    """
+    for scope in scopes:
+        on_commit_once(
+            ('response_generation', scope), partial(bump_generation, scope)
+        )
+
+
+def get_response_key(request, scopes: tuple) -> str:
+    """
+    Builds the cache key of the response from the generations of the
+    scopes, the auth state and the path with the sorted query string.
+    """
+    version = get_generations(*scopes)
+    auth = 'user' if request.user.is_authenticated else 'anonymous'
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f'response:{version}:{auth}:{request.path}?{query}'
+
+
+def cache_anonymous_response(*scopes: str):
+    """
+    Caches successful responses of the viewset action to anonymous users
+    for `RESPONSE_CACHE_TIMEOUT` seconds.
+
+    The responses are invalidated by `invalidate_responses` with any of
+    the scopes, which the signals of the changed models call. Cached
+    validators answer conditional requests without running the action.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return method(self, request, *args, **kwargs)
+            key = get_response_key(request, scopes)
+            cached = cache.get(key)
+            if cached is not None:
+                data, headers = cached
+                response = Response(data, headers=headers)
+                patch_vary_headers(response, ('Authorization', 'Cookie'))
+                return get_conditional_response(
+                    request,
+                    etag=headers.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        headers.get('Last-Modified')
+                    ),
+                    response=response,
+                )
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                headers = {
+                    header: response[header]
+                    for header in CACHED_HEADERS if header in response
+                }
+                cache.set(
+                    key, (response.data, headers),
+                    settings.RESPONSE_CACHE_TIMEOUT,
+                )
+            return response
+        return wrapper
+    return decorator
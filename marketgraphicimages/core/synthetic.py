@@ -0,0 +1,53 @@
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw
+
+from core.image_hash import compute_dhash
+
+SHAPES = ('ellipse', 'rectangle', 'line')
+
+
+def random_color(rnd: random.Random) -> tuple:
+    return tuple(rnd.randrange(256) for _ in range(3))
+
+
+def render_synthetic_image(task: tuple) -> str:
+    """
+    Draws a procedural picture, a gradient with random shapes, and
+    writes it as PNG. The picture depends only on the seed and the index,
+    so the same catalog is rendered in any process.
+
+    Args:
+        task (tuple): The seed, the index of the image, the side of the
+            square picture in pixels and the path to write it to.
+
+    Returns:
+        str: The perceptual hash of the picture.
+    """
+    seed, index, side, path = task
+    rnd = random.Random(f'{seed}:{index}')
+    image = Image.linear_gradient('L').resize((side, side)).rotate(
+        rnd.randrange(360)
+    ).convert('RGB')
+    image = Image.blend(
+        image, Image.new('RGB', image.size, random_color(rnd)), 0.5
+    )
+    draw = ImageDraw.Draw(image)
+    for _ in range(rnd.randint(3, 12)):
+        box = sorted(rnd.sample(range(side), 2)) + sorted(
+            rnd.sample(range(side), 2)
+        )
+        box = (box[0], box[2], box[1], box[3])
+        shape = rnd.choice(SHAPES)
+        if shape == 'line':
+            draw.line(box, fill=random_color(rnd), width=rnd.randint(1, 8))
+        else:
+            getattr(draw, shape)(box, fill=random_color(rnd))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(buffer.getvalue())
+    return compute_dhash(buffer)
@@ -0,0 +1,28 @@
+import threading
+
+from django.db import transaction
+
+_scheduled = threading.local()
+
+
+def on_commit_once(key, func) -> None:
+    """
+    Runs `func` once the current transaction commits.
+
+    Repeated calls with the same `key` within one transaction are merged,
+    so a callback is registered only once. Outside of a transaction
+    `func` runs immediately.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        func()
+        return
+    # Django replaces the list of callbacks after a commit or a rollback,
+    # so the scheduled keys are only valid while the list is the same.
+    if getattr(_scheduled, 'callbacks', None) is not connection.run_on_commit:
+        _scheduled.callbacks = connection.run_on_commit
+        _scheduled.keys = set()
+    if key in _scheduled.keys:
+        return
+    _scheduled.keys.add(key)
+    transaction.on_commit(func)
@@ -5,6 +5,8 @@ from .models import (
     DownloadImage,
     FavoriteImage,
     Image,
+    ImageUpload,
+    RecommendedImage,
     ShoppingCartImage,
     TagImage,
 )
@@ -19,6 +21,7 @@ class TagImageInLine(admin.TabularInline):
 @admin.register(Image)
 class ImageAdmin(admin.ModelAdmin):
     inlines = (TagImageInLine,)
+    raw_id_fields = ('duplicate_of',)
     list_display = (
         'pk',
         'name',
@@ -88,3 +91,28 @@ class DownloadImageAdmin(admin.ModelAdmin):
         'image',
         'user',
     )
+
+
+@admin.register(RecommendedImage)
+class RecommendedImageAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'image',
+        'recommended',
+        'score',
+    )
+    list_filter = (
+        'image',
+    )
+
+
+@admin.register(ImageUpload)
+class ImageUploadAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'filename',
+        'user',
+        'offset',
+        'size',
+        'created',
+    )
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ImagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'images'
+
+    def ready(self):
+        import images.signals  # noqa: F401
+        from images.search import create_search_index
+
+        post_migrate.connect(create_search_index, sender=self)
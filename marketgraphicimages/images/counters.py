@@ -0,0 +1,35 @@
+from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from images.models import Image
+
+
+def change_counter(image_id: int, field: str, delta: int = 1) -> None:
+    """
+    Atomically changes an engagement counter of the image by `delta`
+    and touches its `updated` timestamp.
+
+    Args:
+        image_id (int): Id of the image.
+        field (str): Name of the counter field.
+        delta (int, optional): Value to add to the counter.
+    """
+    Image.objects.filter(pk=image_id).update(
+        **{field: Greatest(models.F(field) + delta, 0)},
+        updated=timezone.now(),
+    )
+
+
+def count_subquery(queryset: models.QuerySet, field: str) -> Coalesce:
+    """Returns a subquery counting rows of `queryset` per image."""
+    return Coalesce(
+        models.Subquery(
+            queryset.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=models.Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
@@ -0,0 +1,156 @@
+"""
+Downloads are buffered in memory and written to the database in bulk by
+a background thread of the process, every `IMAGE_DOWNLOADS_FLUSH_INTERVAL`
+seconds or as soon as the buffer holds `IMAGE_DOWNLOADS_BUFFER_SIZE`
+events, and once more when the process exits normally.
+
+A process killed without the exit handler (SIGKILL, OOM killer, a crash
+of the interpreter) loses the events buffered since the last flush: the
+downloads of the last `IMAGE_DOWNLOADS_FLUSH_INTERVAL` seconds, usually
+no more than `IMAGE_DOWNLOADS_BUFFER_SIZE` of them, in every process. An
+event is also lost if the image is deleted before the flush.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from images.models import DownloadImage, Image
+
+logger = logging.getLogger('main')
+
+_lock = threading.Lock()
+_events = []
+_buffer_full = threading.Event()
+_stopping = threading.Event()
+_flusher = None
+
+
+def record_download(image_id: int, user_id: int = None) -> None:
+    """
+    Buffers a download of the image. The request only appends to the
+    buffer, the flush runs in the background thread.
+
+    Args:
+        image_id (int): Id of the downloaded image.
+        user_id (int, optional): Id of the user, `None` for anonymous
+            downloads, which only increment the counter.
+    """
+    with _lock:
+        _events.append((image_id, user_id))
+        full = len(_events) >= settings.IMAGE_DOWNLOADS_BUFFER_SIZE
+    start_flusher()
+    if full:
+        _buffer_full.set()
+
+
+def start_flusher() -> None:
+    """
+    Starts the background thread flushing the buffer unless it runs in
+    this process already. The thread is started lazily, so that forked
+    server workers get their own one. A falsy
+    `IMAGE_DOWNLOADS_FLUSH_INTERVAL` disables the thread, the buffer is
+    then flushed only by `flush_downloads` calls.
+    """
+    global _flusher
+    if not settings.IMAGE_DOWNLOADS_FLUSH_INTERVAL:
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _stopping.clear()
+        _flusher = threading.Thread(
+            target=run_flusher, name='image-downloads-flusher', daemon=True
+        )
+        _flusher.start()
+
+
+def stop_flusher(timeout: float = None) -> None:
+    """Stops the background thread after its last flush."""
+    global _flusher
+    with _lock:
+        flusher, _flusher = _flusher, None
+    if flusher is None:
+        return
+    _stopping.set()
+    _buffer_full.set()
+    flusher.join(timeout)
+
+
+def run_flusher() -> None:
+    """Flushes the buffer on every interval or when it gets full."""
+    while not _stopping.is_set():
+        _buffer_full.wait(settings.IMAGE_DOWNLOADS_FLUSH_INTERVAL)
+        _buffer_full.clear()
+        try:
+            flush_downloads()
+        except Exception:
+            logger.exception('Failed to flush image downloads')
+        finally:
+            connection.close()
+
+
+def take_events() -> list:
+    """Empties the buffer and returns the events it held."""
+    with _lock:
+        events = _events[:]
+        _events.clear()
+    return events
+
+
+def flush_downloads() -> int:
+    """
+    Writes the buffered downloads: the download history of users gets
+    one row per image, and `downloads_count` grows by every event.
+
+    The events are put back to the buffer if the writing fails.
+
+    Returns:
+        int: The number of flushed events.
+    """
+    events = take_events()
+    if not events:
+        return 0
+    try:
+        return write_events(events)
+    except Exception:
+        with _lock:
+            _events[:0] = events
+        raise
+
+
+def write_events(events: list) -> int:
+    """Writes the events, skipping those of deleted images."""
+    existing = set(
+        Image.objects.filter(
+            id__in={image_id for image_id, _ in events}
+        ).values_list('id', flat=True)
+    )
+    events = [event for event in events if event[0] in existing]
+    with transaction.atomic():
+        DownloadImage.objects.bulk_create(
+            [
+                DownloadImage(image_id=image_id, user_id=user_id)
+                for image_id, user_id in set(events)
+                if user_id is not None
+            ],
+            ignore_conflicts=True,
+        )
+        for image_id, count in sorted(
+            Counter(image_id for image_id, _ in events).items()
+        ):
+            Image.objects.filter(id=image_id).update(
+                downloads_count=models.F('downloads_count') + count,
+                updated=timezone.now(),
+            )
+    return len(events)
+
+
+@atexit.register
+def flush_on_exit() -> None:
+    stop_flusher(timeout=settings.IMAGE_DOWNLOADS_FLUSH_INTERVAL)
+    flush_downloads()
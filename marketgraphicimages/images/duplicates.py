@@ -0,0 +1,100 @@
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+
+from core.image_hash import BKTree, hamming_distance
+from images.models import Image
+
+REJECT = 'reject'
+WARN = 'warn'
+LINK = 'link'
+
+
+class DuplicateIndex:
+    """
+    In-memory BK-tree of the hashes of images, filled from the database
+    on the first search and then synced with the recently updated images.
+
+    Replaced and deleted images stay in the tree, so every result is
+    checked against the current hashes in the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tree = BKTree()
+        self.hashes = {}
+        self.synced_at = None
+
+    def sync(self) -> None:
+        """Adds the images updated since the last sync to the tree."""
+        images = Image.objects.exclude(dhash='')
+        if self.synced_at is not None:
+            # Rows committed late may carry a slightly older timestamp.
+            images = images.filter(
+                updated__gte=self.synced_at - timedelta(
+                    seconds=settings.IMAGE_DUPLICATE_SYNC_OVERLAP
+                )
+            )
+        for image_id, dhash, updated in images.values_list(
+            'id', 'dhash', 'updated'
+        ).iterator():
+            if self.hashes.get(image_id) != dhash:
+                self.hashes[image_id] = dhash
+                self.tree.add(dhash, image_id)
+            if self.synced_at is None or updated > self.synced_at:
+                self.synced_at = updated
+
+    def search(self, dhash: str, max_distance: int) -> list:
+        """Returns ids of the images within `max_distance` of the hash."""
+        with self.lock:
+            self.sync()
+            return [
+                image_id
+                for _, node_hash, image_ids in self.tree.search(
+                    dhash, max_distance
+                )
+                for image_id in image_ids
+                if self.hashes.get(image_id) == node_hash
+            ]
+
+
+index = DuplicateIndex()
+
+
+def find_duplicates(dhash: str, exclude_id: int = None) -> list:
+    """
+    Finds the images within `IMAGE_DUPLICATE_DISTANCE` bits of the hash.
+
+    Args:
+        dhash (str): The hash of the image.
+        exclude_id (int, optional): Id of the image to skip.
+
+    Returns:
+        list: Ids of the duplicates, closest first.
+    """
+    if not dhash:
+        return []
+    candidate_ids = [
+        image_id
+        for image_id in index.search(
+            dhash, settings.IMAGE_DUPLICATE_DISTANCE
+        )
+        if image_id != exclude_id
+    ]
+    hashes = dict(
+        Image.objects.filter(
+            id__in=candidate_ids
+        ).values_list('id', 'dhash')
+    )
+    return sorted(
+        (
+            image_id for image_id in candidate_ids
+            if hashes.get(image_id)
+            and hamming_distance(dhash, hashes[image_id])
+            <= settings.IMAGE_DUPLICATE_DISTANCE
+        ),
+        key=lambda image_id: (
+            hamming_distance(dhash, hashes[image_id]), image_id
+        ),
+    )
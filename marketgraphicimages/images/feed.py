@@ -0,0 +1,132 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from images.models import Image, TimelineEntry
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(author: User) -> bool:
+    """
+    Tells whether images of the author are copied into the timelines of
+    the subscribers. Images of authors with more than
+    `FEED_FANOUT_LIMIT` subscribers are merged into feeds on reading.
+    """
+    return author.subscribers_count <= settings.FEED_FANOUT_LIMIT
+
+
+def fan_out_image(image_id: int) -> None:
+    """Adds the image to the timelines of the subscribers of its author."""
+    image = Image.objects.select_related('author').filter(
+        pk=image_id
+    ).first()
+    if image is None or not is_fanned_out(image.author):
+        return
+    subscriber_ids = Subscription.objects.filter(
+        author_id=image.author_id
+    ).values_list('subscriber_id', flat=True).iterator(chunk_size=BATCH_SIZE)
+    while True:
+        batch = list(islice(subscriber_ids, BATCH_SIZE))
+        if not batch:
+            break
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, image_id=image.pk, created=image.created
+                )
+                for user_id in batch
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def backfill_timeline(user_id: int, author_id: int) -> None:
+    """
+    Adds the latest `FEED_BACKFILL_SIZE` images of the author to the
+    timeline of a new subscriber.
+
+    The job may run after the user has unsubscribed, so the subscription
+    is locked for the backfill and nothing is added without it.
+    """
+    author = User.objects.filter(pk=author_id).first()
+    if author is None or not is_fanned_out(author):
+        return
+    with transaction.atomic():
+        subscription = Subscription.objects.select_for_update().filter(
+            subscriber_id=user_id, author_id=author_id
+        ).first()
+        if subscription is None:
+            return
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(
+                    user_id=user_id, image_id=image_id, created=created
+                )
+                for image_id, created in Image.objects.filter(
+                    author_id=author_id
+                ).order_by('-created', '-id').values_list(
+                    'id', 'created'
+                )[:settings.FEED_BACKFILL_SIZE]
+            ),
+            ignore_conflicts=True,
+        )
+
+
+def remove_from_timeline(user_id: int, author_id: int) -> None:
+    """Removes the images of the author from the timeline of the user."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, image__author_id=author_id
+    ).delete()
+
+
+def after(position: tuple, created: str, pk: str) -> Q:
+    """Returns the condition of rows after `(created, id)` position."""
+    if position is None:
+        return Q()
+    return Q(**{f'{created}__lt': position[0]}) | Q(
+        **{created: position[0], f'{pk}__lt': position[1]}
+    )
+
+
+def get_feed_page(user: User, position: tuple, limit: int) -> tuple:
+    """
+    Returns a page of the feed of the user, newest first.
+
+    The page merges the timeline of the user with the images of the
+    followed authors that are not fanned out.
+
+    Args:
+        user (User): The owner of the feed.
+        position (tuple): `(created, id)` of the last image of the
+            previous page, `None` for the first page.
+        limit (int): The size of the page.
+
+    Returns:
+        tuple: Ids of the images of the page and the position of the
+        next page, `None` after the last page.
+    """
+    rows = set(
+        TimelineEntry.objects.filter(
+            after(position, 'created', 'image_id'), user=user,
+        ).order_by('-created', '-image_id').values_list(
+            'created', 'image_id'
+        )[:limit]
+    )
+    rows.update(
+        Image.objects.filter(
+            after(position, 'created', 'id'),
+            author__in=Subscription.objects.filter(
+                subscriber=user,
+                author__subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+            ).values('author'),
+        ).order_by('-created', '-id').values_list('created', 'id')[:limit]
+    )
+    rows = sorted(rows, reverse=True)[:limit]
+    return (
+        [image_id for _, image_id in rows],
+        rows[-1] if len(rows) == limit else None,
+    )
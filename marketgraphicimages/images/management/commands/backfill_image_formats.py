@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from core.image_format import detect_image_format
+from images.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Detects the format of images uploaded before it was stored.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Detect the format of all images, not only missing ones.',
+        )
+
+    def handle(self, *args, **options):
+        images = Image.objects.all()
+        if not options['all']:
+            images = images.filter(category='')
+        for image in tqdm(
+            images.only('id', 'image').iterator(), total=images.count(),
+            desc='Detecting formats', colour='green',
+        ):
+            try:
+                with image.image.open('rb') as file:
+                    category, extension = detect_image_format(file)
+            except FileNotFoundError:
+                self.stderr.write(f'File of image {image.id} is not found.')
+                continue
+            Image.objects.filter(id=image.id).update(
+                category=category, extension=extension
+            )
+        print('Done!')
@@ -0,0 +1,37 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+from tqdm import tqdm
+
+from core.image_hash import compute_dhash
+from images.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Computes perceptual hashes of images uploaded before them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Hash all images, not only the ones without a hash.',
+        )
+
+    def handle(self, *args, **options):
+        images = Image.objects.all()
+        if not options['all']:
+            images = images.filter(dhash='')
+        for image in tqdm(
+            images.only('id', 'image').iterator(), total=images.count(),
+            desc='Hashing images', colour='green',
+        ):
+            try:
+                with image.image.open('rb') as file:
+                    dhash = compute_dhash(file)
+            except FileNotFoundError:
+                self.stderr.write(f'File of image {image.id} is not found.')
+                continue
+            if dhash:
+                # Touching `updated` lets running duplicate indexes sync.
+                Image.objects.filter(id=image.id).update(
+                    dhash=dhash, updated=timezone.now()
+                )
+        print('Done!')
@@ -0,0 +1,92 @@
+import random
+import statistics
+import string
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from tqdm import tqdm
+
+from images.models import Image
+from images.search import index_search_documents, search_images
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the full-text search of images with the former '
+        'icontains filter on a synthetic catalog. All the created rows '
+        'are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_words(self, rnd: random.Random, count: int) -> list:
+        return [
+            ''.join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 9)))
+            for _ in range(count)
+        ]
+
+    def create_catalog(self, rnd: random.Random, rows: int, words: list):
+        """Bulk creates images with random names and search documents."""
+        author = User.objects.create(
+            username='benchmark_search', email='benchmark_search@pictura.ru'
+        )
+        with tqdm(total=rows, desc='Creating images', colour='green') as bar:
+            for start in range(0, rows, BATCH_SIZE):
+                images = []
+                for num in range(start, min(start + BATCH_SIZE, rows)):
+                    name = ' '.join(rnd.sample(words, 3))
+                    images.append(Image(
+                        author=author,
+                        name=name,
+                        image=f'images/benchmark_{num}.png',
+                        license=Image.LicenseType.FREE,
+                        price=0,
+                        search_document=f'{name} {author.username}',
+                    ))
+                images = Image.objects.bulk_create(images)
+                index_search_documents(images)
+                bar.update(len(images))
+
+    def measure(self, filter_images, values: list) -> list:
+        timings = []
+        for value in values:
+            start = time.perf_counter()
+            list(filter_images(Image.objects.all(), value)[:20])
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, name: str, timings: list) -> None:
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(
+            f'{name}: mean {statistics.mean(timings):.2f} ms, '
+            f'p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        words = self.make_words(rnd, 5000)
+        values = [
+            rnd.choice(words)[:rnd.randint(3, 6)]
+            for _ in range(options['queries'])
+        ]
+        with transaction.atomic():
+            self.create_catalog(rnd, options['rows'], words)
+            self.report('icontains', self.measure(
+                lambda queryset, value: queryset.filter(
+                    Q(name__icontains=value) | Q(name__startswith=value)
+                ).distinct(),
+                values,
+            ))
+            self.report('full-text', self.measure(search_images, values))
+            transaction.set_rollback(True)
@@ -0,0 +1,20 @@
+from django.core.management import BaseCommand
+from django.db import models
+
+from images.models import DownloadImage
+
+
+class Command(BaseCommand):
+    help = (
+        'Removes repeated downloads of an image by the same user. '
+        'Run it before applying the unique constraint of downloads.'
+    )
+
+    def handle(self, *args, **kwargs):
+        first_ids = DownloadImage.objects.values(
+            'image', 'user'
+        ).annotate(
+            first_id=models.Min('id')
+        ).values('first_id')
+        deleted, _ = DownloadImage.objects.exclude(id__in=first_ids).delete()
+        print(f'Done! Downloads deleted: {deleted}')
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from images.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Deletes chunked uploads which were never finalized.'
+
+    def handle(self, *args, **kwargs):
+        deleted = delete_expired_uploads()
+        print(f'Done! Uploads deleted: {deleted}')
@@ -0,0 +1,29 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from core.derivatives import generate_derivatives
+from images.models import Image
+
+
+class Command(BaseCommand):
+    help = 'Generates thumbnails and previews of images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Regenerate derivatives of all images, not only missing.',
+        )
+
+    def handle(self, *args, **options):
+        images = Image.objects.all()
+        if not options['all']:
+            images = images.filter(thumbnail='')
+        for image in tqdm(
+            images.iterator(), total=images.count(),
+            desc='Generating derivatives', colour='green',
+        ):
+            try:
+                generate_derivatives(image)
+            except FileNotFoundError:
+                self.stderr.write(f'File of image {image.id} is not found.')
+        print('Done!')
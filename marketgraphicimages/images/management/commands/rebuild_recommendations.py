@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from images.models import Image
+from images.recommendations import rebuild_image_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the recommendation index of all images.'
+
+    def handle(self, *args, **kwargs):
+        image_ids = Image.objects.values_list('id', flat=True)
+        for image_id in tqdm(
+            image_ids.iterator(), total=image_ids.count(),
+            desc='Rebuilding recommendations', colour='green',
+        ):
+            rebuild_image_recommendations(image_id)
+        print('Done!')
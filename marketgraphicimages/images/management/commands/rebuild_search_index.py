@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from images.models import Image
+from images.search import create_search_index, update_search_document
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of images.'
+
+    def handle(self, *args, **kwargs):
+        create_search_index()
+        image_ids = Image.objects.values_list('id', flat=True)
+        for image_id in tqdm(
+            image_ids.iterator(), total=image_ids.count(),
+            desc='Indexing images', colour='green',
+        ):
+            update_search_document(image_id)
+        print('Done!')
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+from tqdm import tqdm
+
+from images.feed import backfill_timeline
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the feed timelines of subscribers with the latest images '
+        'of their authors, e.g. after subscriptions were bulk loaded.'
+    )
+
+    def handle(self, *args, **kwargs):
+        subscriptions = Subscription.objects.values_list(
+            'subscriber_id', 'author_id'
+        )
+        for user_id, author_id in tqdm(
+            subscriptions.iterator(), total=subscriptions.count(),
+            desc='Rebuilding timelines', colour='green',
+        ):
+            backfill_timeline(user_id, author_id)
+        print('Done!')
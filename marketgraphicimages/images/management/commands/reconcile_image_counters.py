@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+
+from comments.models import Comment
+from images.counters import count_subquery
+from images.models import FavoriteImage, Image
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculates favorites and comments counters of images. '
+        'The downloads counter counts download events, including '
+        'anonymous ones, so it can not be recalculated.'
+    )
+
+    def handle(self, *args, **kwargs):
+        updated = Image.objects.update(
+            favorites_count=count_subquery(
+                FavoriteImage.objects.all(), 'image'
+            ),
+            comments_count=count_subquery(
+                Comment.objects.all(), 'commented_post'
+            ),
+        )
+        print(f'Done! Images updated: {updated}')
@@ -1,17 +1,50 @@
+import uuid
+
 from django.core.validators import (
     FileExtensionValidator,
     MaxValueValidator,
     MinValueValidator,
 )
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from marketgraphicimages.settings import ALLOWED_EXTENSIONS
 
+from core.image_format import GIF, RASTER, VECTOR, detect_image_format
+from core.image_hash import compute_dhash
 from tags.models import Tag
 from users.models import User, UserConnection
 
 
+class ImageQuerySet(models.QuerySet):
+    """QuerySet of images with helpers for serialization."""
+
+    def with_is_favorited(self, user):
+        """
+        Fetches the author with a join and annotates `is_favorited`
+        for the given user with a single subquery.
+        """
+        if user is None or not user.is_authenticated:
+            is_favorited = models.Value(False)
+        else:
+            is_favorited = models.Exists(
+                FavoriteImage.objects.filter(
+                    image=models.OuterRef('pk'), user=user,
+                )
+            )
+        return self.select_related('author').annotate(
+            is_favorited=is_favorited
+        )
+
+    def touch(self) -> int:
+        """
+        Sets `updated` of the images to now, so their ETags change after
+        a change of related data.
+        """
+        return self.update(updated=timezone.now())
+
+
 class Image(models.Model):
     """Model of images."""
 
@@ -21,11 +54,24 @@ class Image(models.Model):
         FREE = 'free', _('free')
         PAID = 'paid', _('paid')
 
+    class Category(models.TextChoices):
+        """Class of choices categories of image formats."""
+
+        RASTER = RASTER, _('raster')
+        VECTOR = VECTOR, _('vector')
+        GIF = GIF, _('gif')
+
     created = models.DateTimeField(
         verbose_name=_('Date of creation'),
         auto_now_add=True,
         help_text=_('Automatically sets the current date and time'),
     )
+    updated = models.DateTimeField(
+        verbose_name=_('Date of update'),
+        auto_now=True,
+        db_index=True,
+        help_text=_('Changes when the image or its counters change'),
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -47,6 +93,58 @@ class Image(models.Model):
             FileExtensionValidator(allowed_extensions=ALLOWED_EXTENSIONS)
         ]
     )
+    category = models.CharField(
+        verbose_name=_('Category'),
+        max_length=10,
+        choices=Category.choices,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text=_('Detected from the contents of the file on upload'),
+    )
+    extension = models.CharField(
+        verbose_name=_('Extension'),
+        max_length=10,
+        blank=True,
+        editable=False,
+        help_text=_('Detected from the contents of the file on upload'),
+    )
+    thumbnail = models.ImageField(
+        verbose_name=_('Thumbnail'),
+        upload_to='images/',
+        blank=True,
+        editable=False,
+        width_field='thumbnail_width',
+        height_field='thumbnail_height',
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        verbose_name=_('Thumbnail width'),
+        null=True,
+        editable=False,
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        verbose_name=_('Thumbnail height'),
+        null=True,
+        editable=False,
+    )
+    preview = models.ImageField(
+        verbose_name=_('Preview'),
+        upload_to='images/',
+        blank=True,
+        editable=False,
+        width_field='preview_width',
+        height_field='preview_height',
+    )
+    preview_width = models.PositiveIntegerField(
+        verbose_name=_('Preview width'),
+        null=True,
+        editable=False,
+    )
+    preview_height = models.PositiveIntegerField(
+        verbose_name=_('Preview height'),
+        null=True,
+        editable=False,
+    )
     license = models.CharField(
         verbose_name=_('License'),
         max_length=15,
@@ -65,9 +163,58 @@ class Image(models.Model):
         verbose_name=_('Tag'),
         help_text=_('Select tags'),
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name=_('Number of favorites'),
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    downloads_count = models.PositiveIntegerField(
+        verbose_name=_('Number of downloads'),
+        default=0,
+        editable=False,
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name=_('Number of comments'),
+        default=0,
+        editable=False,
+    )
+    dhash = models.CharField(
+        verbose_name=_('Perceptual hash'),
+        max_length=16,
+        blank=True,
+        default='',
+        db_index=True,
+        editable=False,
+        help_text=_('Difference hash of the image for duplicate search'),
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='duplicates',
+        verbose_name=_('Duplicate of'),
+        help_text=_('The earlier upload of the same picture'),
+    )
+    search_document = models.TextField(
+        verbose_name=_('Search document'),
+        blank=True,
+        default='',
+        editable=False,
+        help_text=_('Name, tags and author of the image for search'),
+    )
+
+    objects = ImageQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                name='image_created_id_idx',
+                fields=('-created', 'id'),
+            ),
+        ]
         verbose_name = _('Image')
         verbose_name_plural = _('Images')
 
@@ -77,6 +224,12 @@ class Image(models.Model):
              _('Image name') + f': {self.name[:15]}')
         )
 
+    def save(self, *args, **kwargs):
+        if self.image and not self.image._committed:
+            self.category, self.extension = detect_image_format(self.image)
+            self.dhash = compute_dhash(self.image.file)
+        super().save(*args, **kwargs)
+
 
 class ImageConnection(models.Model):
     image = models.ForeignKey(
@@ -142,6 +295,104 @@ class TagImage(ImageConnection):
 
 class DownloadImage(ImageConnection, UserConnection):
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_download',
+                fields=('image', 'user'),
+            ),
+        ]
         verbose_name = _('My download image')
         verbose_name_plural = _('My download images')
         ordering = ('user',)
+
+
+class RecommendedImage(ImageConnection):
+    """Precomputed recommendation of one image for another."""
+
+    recommended = models.ForeignKey(
+        Image,
+        on_delete=models.CASCADE,
+        related_name='recommended_for',
+        verbose_name=_('Recommended image'),
+        help_text=_('Select recommended image'),
+    )
+    score = models.PositiveSmallIntegerField(
+        verbose_name=_('Score'),
+        help_text=_('Number of shared most popular tags'),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_recommended_image',
+                fields=('image', 'recommended'),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='recommended_image_score_idx',
+                fields=('image', '-score'),
+            ),
+        ]
+        verbose_name = _('Recommended image')
+        verbose_name_plural = _('Recommended images')
+
+
+class TimelineEntry(ImageConnection, UserConnection):
+    """An image of a followed author in the feed of the user."""
+
+    created = models.DateTimeField(
+        verbose_name=_('Date of creation'),
+        help_text=_('Date of creation of the image'),
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_timeline_entry',
+                fields=('user', 'image'),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='timeline_entry_keyset_idx',
+                fields=('user', '-created', '-image'),
+            ),
+        ]
+        verbose_name = _('Timeline entry')
+        verbose_name_plural = _('Timeline entries')
+
+
+class ImageUpload(UserConnection):
+    """A file uploaded in chunks before an image is created from it."""
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+    )
+    filename = models.CharField(
+        verbose_name=_('File name'),
+        max_length=255,
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name=_('Size'),
+        help_text=_('Size of the whole file in bytes'),
+    )
+    offset = models.PositiveBigIntegerField(
+        verbose_name=_('Offset'),
+        default=0,
+        help_text=_('Number of bytes received'),
+    )
+    created = models.DateTimeField(
+        verbose_name=_('Date of creation'),
+        auto_now_add=True,
+    )
+
+    class Meta:
+        verbose_name = _('Image upload')
+        verbose_name_plural = _('Image uploads')
+        ordering = ('-created',)
+
+    def __str__(self) -> str:
+        return f'{self.filename}: {self.offset}/{self.size}'
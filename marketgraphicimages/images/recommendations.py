@@ -0,0 +1,174 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import RowNumber
+
+from core.transaction import on_commit_once
+from images.models import Image, RecommendedImage, TagImage
+from tags.models import Tag
+
+
+def get_ranked_tags(image_ids) -> dict:
+    """
+    Returns the most popular tags of every image.
+
+    Args:
+        image_ids: Ids of images.
+
+    Returns:
+        dict: Image id mapped to the list of its tag ids, most popular
+        first, truncated to `MAX_NUM_OF_TAGS_RECOMENDED_COMBO`.
+    """
+    image_tags = {}
+    for image_id, tag_id in TagImage.objects.filter(
+        image_id__in=image_ids
+    ).values_list('image_id', 'tag_id'):
+        image_tags.setdefault(image_id, []).append(tag_id)
+    popularity = dict(
+        Tag.objects.filter(
+            id__in={tag for tags in image_tags.values() for tag in tags}
+        ).annotate(
+            image_count=models.Count('tagimage')
+        ).values_list('id', 'image_count')
+    )
+    return {
+        image_id: sorted(
+            tags, key=lambda tag: (-popularity.get(tag, 0), tag)
+        )[:settings.MAX_NUM_OF_TAGS_RECOMENDED_COMBO]
+        for image_id, tags in image_tags.items()
+    }
+
+
+def get_score(ranked_tags: list, tags: set) -> int:
+    """
+    Returns the length of the longest prefix of `ranked_tags`
+    contained in `tags`.
+    """
+    score = 0
+    for tag in ranked_tags:
+        if tag not in tags:
+            break
+        score += 1
+    return score
+
+
+def rebuild_image_recommendations(image_id: int) -> None:
+    """
+    Rebuilds the ranked list of recommendations of the image.
+
+    Images sharing all of the most popular tags of the image go first,
+    then the images sharing all but the least popular of them and so on.
+    Newer images go first within the same score.
+    """
+    RecommendedImage.objects.filter(image_id=image_id).delete()
+    ranked_tags = get_ranked_tags((image_id,)).get(image_id, [])
+    size = settings.IMAGES_RECOMENDED_INDEX_SIZE
+    seen = {image_id}
+    recommendations = []
+    for score in range(len(ranked_tags), 0, -1):
+        images = Image.objects.all()
+        for tag_id in ranked_tags[:score]:
+            images = images.filter(tags=tag_id)
+        new_ids = list(
+            images.exclude(id__in=seen).values_list('id', flat=True)[
+                :size - len(recommendations)
+            ]
+        )
+        seen.update(new_ids)
+        recommendations.extend(
+            RecommendedImage(
+                image_id=image_id, recommended_id=new_id, score=score
+            ) for new_id in new_ids
+        )
+        if len(recommendations) >= size:
+            break
+    RecommendedImage.objects.bulk_create(recommendations)
+
+
+def fan_out_image_recommendations(image_id: int) -> None:
+    """
+    Adds the image to the recommendations of the latest images sharing
+    its tags, up to `IMAGES_RECOMENDED_FANOUT_LIMIT` of them.
+
+    Older images pick it up with the `rebuild_recommendations` command.
+    """
+    RecommendedImage.objects.filter(recommended_id=image_id).delete()
+    tags = set(
+        TagImage.objects.filter(
+            image_id=image_id
+        ).values_list('tag_id', flat=True)
+    )
+    if not tags:
+        return
+    candidate_ids = Image.objects.filter(
+        tags__in=tags
+    ).exclude(
+        id=image_id
+    ).values_list(
+        'id', flat=True
+    ).distinct()[:settings.IMAGES_RECOMENDED_FANOUT_LIMIT]
+    recommendations = []
+    for candidate_id, ranked_tags in get_ranked_tags(
+        list(candidate_ids)
+    ).items():
+        score = get_score(ranked_tags, tags)
+        if score:
+            recommendations.append(
+                RecommendedImage(
+                    image_id=candidate_id,
+                    recommended_id=image_id,
+                    score=score,
+                )
+            )
+    RecommendedImage.objects.bulk_create(
+        recommendations, ignore_conflicts=True
+    )
+    trim_recommendations(
+        [recommendation.image_id for recommendation in recommendations]
+    )
+
+
+def trim_recommendations(image_ids: list) -> None:
+    """
+    Deletes the recommendations of the images beyond their best
+    `IMAGES_RECOMENDED_INDEX_SIZE`, in the order they are read in.
+    """
+    if not image_ids:
+        return
+    extra_ids = list(
+        RecommendedImage.objects.filter(
+            image_id__in=image_ids
+        ).annotate(
+            position=models.Window(
+                RowNumber(),
+                partition_by='image_id',
+                order_by=(
+                    '-score', '-recommended__created', '-recommended_id'
+                ),
+            )
+        ).filter(
+            position__gt=settings.IMAGES_RECOMENDED_INDEX_SIZE
+        ).values_list('id', flat=True)
+    )
+    RecommendedImage.objects.filter(id__in=extra_ids).delete()
+
+
+def update_recommendations(image_id: int) -> None:
+    """Updates the recommendation index after tags of the image change."""
+    if not Image.objects.filter(id=image_id).exists():
+        return
+    with transaction.atomic():
+        rebuild_image_recommendations(image_id)
+        fan_out_image_recommendations(image_id)
+
+
+def schedule_recommendations_update(image_id: int) -> None:
+    """
+    Updates the recommendation index of the image once the current
+    transaction commits.
+    """
+    on_commit_once(
+        ('recommendations', image_id),
+        partial(update_recommendations, image_id),
+    )
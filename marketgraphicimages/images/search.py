@@ -0,0 +1,167 @@
+import re
+from functools import partial
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+)
+from django.db import DatabaseError, connection, connections, models
+from django.db.models.expressions import RawSQL
+
+from core.transaction import on_commit_once
+from images.models import Image
+
+FTS_TABLE = 'images_image_fts'
+POSTGRES_INDEX = 'images_image_search_idx'
+SEARCH_CONFIG = 'simple'
+
+_fts_table_exists = False
+
+
+class DocumentVector(models.Func):
+    """The `to_tsvector` expression the PostgreSQL search index is built on."""
+
+    function = 'to_tsvector'
+    template = f"%(function)s('{SEARCH_CONFIG}'::regconfig, %(expressions)s)"
+    output_field = SearchVectorField()
+
+
+def get_search_terms(value: str) -> list:
+    """Splits the search string into words."""
+    return re.findall(r'\w+', value.lower())
+
+
+def create_search_index(using: str = 'default', **kwargs) -> None:
+    """
+    Creates the full-text index of images: a GIN index on PostgreSQL
+    and an FTS5 table on SQLite. Other databases use no index.
+    """
+    db = connections[using]
+    with db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} '
+                f'ON images_image USING gin ('
+                f"to_tsvector('{SEARCH_CONFIG}'::regconfig, search_document))"
+            )
+        elif db.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                    "USING fts5(search_document, tokenize='unicode61')"
+                )
+            except DatabaseError:
+                pass
+
+
+def has_fts_table() -> bool:
+    """Checks whether SQLite was built with FTS5 and the table exists."""
+    global _fts_table_exists
+    if not _fts_table_exists:
+        _fts_table_exists = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_table_exists
+
+
+def build_search_document(image: Image) -> str:
+    """Joins the name, the tag names and the author username of the image."""
+    return ' '.join((
+        image.name,
+        *image.tags.values_list('name', flat=True),
+        image.author.username,
+    ))
+
+
+def update_search_document(image_id: int) -> None:
+    """Stores the search document of the image and indexes it."""
+    image = Image.objects.select_related('author').filter(id=image_id).first()
+    if image is None:
+        delete_search_document(image_id)
+        return
+    document = build_search_document(image)
+    Image.objects.filter(id=image_id).update(search_document=document)
+    if connection.vendor == 'sqlite' and has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (image_id,)
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, search_document) '
+                'VALUES (%s, %s)',
+                (image_id, document),
+            )
+
+
+def index_search_documents(images) -> None:
+    """
+    Adds bulk created images with filled search documents to the SQLite
+    full-text table. PostgreSQL indexes the column by itself.
+    """
+    if connection.vendor == 'sqlite' and has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                '(rowid, search_document) VALUES (%s, %s)',
+                [(image.id, image.search_document) for image in images],
+            )
+
+
+def delete_search_document(image_id: int) -> None:
+    """Removes the image from the SQLite full-text table."""
+    if connection.vendor == 'sqlite' and has_fts_table():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (image_id,)
+            )
+
+
+def schedule_search_update(image_id: int) -> None:
+    """Updates the search document once the transaction commits."""
+    on_commit_once(
+        ('search_document', image_id),
+        partial(update_search_document, image_id),
+    )
+
+
+def search_images(queryset: models.QuerySet, value: str) -> models.QuerySet:
+    """
+    Filters images matching every word of `value` as a prefix in the
+    name, the tag names or the author username, most relevant first.
+    """
+    terms = get_search_terms(value)
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            config=SEARCH_CONFIG,
+            search_type='raw',
+        )
+        return queryset.annotate(
+            document=DocumentVector('search_document'),
+        ).filter(
+            document=query,
+        ).annotate(
+            rank=SearchRank(models.F('document'), query),
+        ).order_by('-rank', '-created')
+    if connection.vendor == 'sqlite' and has_fts_table():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                (match,),
+            ),
+        ).annotate(
+            rank=RawSQL(
+                f'SELECT rank FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid = {Image._meta.db_table}.id',
+                (match,),
+            ),
+        ).order_by('rank', '-created')
+    for term in terms:
+        queryset = queryset.filter(search_document__icontains=term)
+    return queryset
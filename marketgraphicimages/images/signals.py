@@ -0,0 +1,129 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+)
+from django.dispatch import receiver
+
+from core.response_cache import IMAGES, invalidate_responses
+from images.counters import change_counter
+from images.models import FavoriteImage, Image, TagImage
+from images.recommendations import schedule_recommendations_update
+from images.search import delete_search_document, schedule_search_update
+from tags.covers import schedule_tag_cover_refresh
+from users.counters import change_user_counter
+from users.models import User
+
+
+@receiver(m2m_changed, sender=Image.tags.through)
+def image_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Updates recommendations, search documents and tag covers after tags
+    of images are changed.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    invalidate_responses(IMAGES)
+    if action == 'pre_clear':
+        pk_set = set(
+            TagImage.objects.filter(
+                **{'tag' if reverse else 'image': instance}
+            ).values_list('image_id' if reverse else 'tag_id', flat=True)
+        )
+    if reverse:
+        Image.objects.filter(id__in=pk_set).touch()
+        schedule_tag_cover_refresh(instance.pk)
+        for image_id in pk_set:
+            schedule_recommendations_update(image_id)
+            schedule_search_update(image_id)
+        return
+    Image.objects.filter(id=instance.pk).touch()
+    schedule_recommendations_update(instance.pk)
+    schedule_search_update(instance.pk)
+    for tag_id in pk_set:
+        schedule_tag_cover_refresh(tag_id)
+
+
+@receiver(post_save, sender=TagImage)
+@receiver(post_delete, sender=TagImage)
+def tag_image_changed(sender, instance, **kwargs):
+    """
+    Updates recommendations, search documents and tag covers after a tag
+    of an image is changed.
+    """
+    invalidate_responses(IMAGES)
+    Image.objects.filter(id=instance.image_id).touch()
+    schedule_recommendations_update(instance.image_id)
+    schedule_search_update(instance.image_id)
+    schedule_tag_cover_refresh(instance.tag_id)
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, created, **kwargs):
+    """
+    Updates the search document and the cached responses. A new image
+    increments the images counter of the author.
+    """
+    schedule_search_update(instance.pk)
+    invalidate_responses(IMAGES)
+    if created:
+        change_user_counter(instance.author_id, 'images_count')
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    """
+    Removes the image from the search index and cached responses and
+    decrements the images counter of the author.
+    """
+    delete_search_document(instance.pk)
+    invalidate_responses(IMAGES)
+    change_user_counter(instance.author_id, 'images_count', -1)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    """
+    Remembers the loaded username to tell renames from other saves.
+    A deferred username is not loaded for this.
+    """
+    instance.loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields, **kwargs):
+    """
+    Updates the search documents and the cached responses after the
+    author's username changes. Other saves of the user, such as
+    password and counter updates, do not touch the images.
+    """
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    loaded_username = instance.loaded_username
+    instance.loaded_username = instance.username
+    if created or instance.username == loaded_username:
+        return
+    image_ids = list(Image.objects.filter(
+        author_id=instance.pk
+    ).values_list('id', flat=True))
+    for image_id in image_ids:
+        schedule_search_update(image_id)
+    if image_ids:
+        Image.objects.filter(id__in=image_ids).touch()
+        invalidate_responses(IMAGES)
+
+
+@receiver(post_save, sender=FavoriteImage)
+def favorite_created(sender, instance, created, **kwargs):
+    """Increments the favorites counter of the image."""
+    if created:
+        change_counter(instance.image_id, 'favorites_count')
+        invalidate_responses(IMAGES)
+
+
+@receiver(post_delete, sender=FavoriteImage)
+def favorite_deleted(sender, instance, **kwargs):
+    """Decrements the favorites counter of the image."""
+    change_counter(instance.image_id, 'favorites_count', -1)
+    invalidate_responses(IMAGES)
@@ -0,0 +1,98 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from images.models import ImageUpload
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadedChunksFile(File):
+    """
+    The assembled file of a chunked upload. The file storage moves it
+    into the media directory by its path instead of copying the data.
+    """
+
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+def get_upload_dir() -> str:
+    """
+    Returns the directory of unfinished uploads. It lies in the media
+    directory, so moving a finished file there is a rename.
+    """
+    return os.path.join(settings.MEDIA_ROOT, settings.CHUNKED_UPLOAD_DIR)
+
+
+def get_upload_path(upload: ImageUpload) -> str:
+    return os.path.join(get_upload_dir(), str(upload.id))
+
+
+def start_upload(upload: ImageUpload) -> None:
+    """Creates the empty file the chunks of the upload are written to."""
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    open(get_upload_path(upload), 'wb').close()
+
+
+def write_chunk(upload: ImageUpload, stream) -> int:
+    """
+    Appends the request body to the file of the upload, reading it by
+    `CHUNK_SIZE` bytes, so memory use does not depend on the chunk size.
+
+    Args:
+        upload (ImageUpload): The upload locked for update.
+        stream: The request stream, `None` for an empty body.
+
+    Returns:
+        int: The new offset of the upload.
+
+    Raises:
+        ValueError: The chunk goes past the declared size of the file.
+    """
+    if stream is None:
+        return upload.offset
+    with open(get_upload_path(upload), 'r+b') as file:
+        file.seek(upload.offset)
+        while True:
+            data = stream.read(CHUNK_SIZE)
+            if not data:
+                break
+            if file.tell() + len(data) > upload.size:
+                file.truncate(upload.offset)
+                raise ValueError
+            file.write(data)
+        return file.tell()
+
+
+def open_upload(upload: ImageUpload) -> UploadedChunksFile:
+    """Opens the assembled file under the original file name."""
+    file = UploadedChunksFile(open(get_upload_path(upload), 'rb'))
+    file.name = upload.filename
+    return file
+
+
+def delete_upload(upload: ImageUpload) -> None:
+    """Deletes the upload and its file if it was not moved."""
+    try:
+        os.remove(get_upload_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def delete_expired_uploads() -> int:
+    """Deletes uploads older than `CHUNKED_UPLOAD_EXPIRATION` seconds."""
+    expired = ImageUpload.objects.filter(
+        created__lt=timezone.now() - timedelta(
+            seconds=settings.CHUNKED_UPLOAD_EXPIRATION
+        )
+    )
+    count = 0
+    for upload in expired.iterator():
+        delete_upload(upload)
+        count += 1
+    return count
@@ -0,0 +1,25 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created',
+    )
+    search_fields = (
+        'name',
+    )
+    list_filter = (
+        'status',
+        'name',
+    )
+    readonly_fields = (
+        'created',
+    )
@@ -0,0 +1,42 @@
+import multiprocessing
+
+from django.core.management import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+
+
+def start_worker(once: bool) -> None:
+    connections.close_all()
+    work(once=once)
+
+
+class Command(BaseCommand):
+    help = 'Runs worker processes executing background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of worker processes.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when there are no due jobs left.',
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] == 1:
+            processed = work(once=options['once'])
+            print(f'Done! Jobs processed: {processed}')
+            return
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(
+                target=start_worker, args=(options['once'],), daemon=True
+            )
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
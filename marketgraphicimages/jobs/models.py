@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """Model of background jobs."""
+
+    class Status(models.TextChoices):
+        """Class of choices statuses of jobs."""
+
+        PENDING = 'pending', _('pending')
+        RUNNING = 'running', _('running')
+        DONE = 'done', _('done')
+        FAILED = 'failed', _('failed')
+
+    name = models.CharField(
+        verbose_name=_('Name'),
+        max_length=255,
+        help_text=_('Dotted path of the function to run'),
+    )
+    kwargs = models.JSONField(
+        verbose_name=_('Arguments'),
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        verbose_name=_('Status'),
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name=_('Attempts'),
+        default=0,
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name=_('Maximum attempts'),
+    )
+    run_at = models.DateTimeField(
+        verbose_name=_('Run at'),
+        default=timezone.now,
+    )
+    locked_at = models.DateTimeField(
+        verbose_name=_('Locked at'),
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        verbose_name=_('Last error'),
+        blank=True,
+    )
+    created = models.DateTimeField(
+        verbose_name=_('Date of creation'),
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ('run_at',)
+        indexes = [
+            models.Index(
+                name='job_status_run_at_idx',
+                fields=('status', 'run_at'),
+            ),
+        ]
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
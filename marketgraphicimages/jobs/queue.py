@@ -0,0 +1,115 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from jobs.models import Job
+
+logger = logging.getLogger('main')
+
+
+def get_job_name(func) -> str:
+    """Returns the dotted path the worker imports the function by."""
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, max_attempts: int = None, **kwargs) -> Job:
+    """
+    Puts a call of `func` into the job queue.
+
+    The job is stored in the current transaction, so workers only see it
+    after the transaction commits. With `JOBS_ALWAYS_EAGER` the function
+    runs right away instead.
+
+    Args:
+        func: A module-level function to call.
+        max_attempts (int, optional): How many times to try the job.
+        **kwargs: JSON serializable arguments of the function.
+
+    Returns:
+        Job: The created job, or None in the eager mode.
+    """
+    if settings.JOBS_ALWAYS_EAGER:
+        func(**kwargs)
+        return None
+    return Job.objects.create(
+        name=get_job_name(func),
+        kwargs=kwargs,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def fetch_job() -> Job:
+    """
+    Locks the next due job and marks it as running.
+
+    Jobs left running longer than `JOBS_LOCK_TIMEOUT` by a dead worker
+    are picked up again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.Status.PENDING, run_at__lte=now,
+        ).first() or Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.Status.RUNNING, locked_at__lt=stale,
+        ).first()
+        if job is None:
+            return None
+        job.status = Job.Status.RUNNING
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=('status', 'locked_at', 'attempts'))
+    return job
+
+
+def run_job(job: Job) -> None:
+    """
+    Runs the job and stores the result. A failed job is retried with
+    an exponential delay until it runs out of attempts.
+    """
+    try:
+        import_string(job.name)(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.Status.PENDING
+            job.run_at = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+            logger.warning('Job %s failed, retrying', job.pk)
+        else:
+            job.status = Job.Status.FAILED
+            logger.error('Job %s failed:\n%s', job.pk, job.last_error)
+    else:
+        job.status = Job.Status.DONE
+    job.locked_at = None
+    job.save(update_fields=('status', 'run_at', 'locked_at', 'last_error'))
+
+
+def work(once: bool = False) -> int:
+    """
+    Runs due jobs one by one, polling the queue every
+    `JOBS_POLL_INTERVAL` seconds when it is empty.
+
+    Args:
+        once (bool, optional): Stop when the queue is empty.
+
+    Returns:
+        int: The number of processed jobs.
+    """
+    processed = 0
+    while True:
+        job = fetch_job()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(settings.JOBS_POLL_INTERVAL)
+            continue
+        run_job(job)
+        processed += 1
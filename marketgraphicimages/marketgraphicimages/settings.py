@@ -52,11 +52,13 @@ LOCAL_APPS = (
     'core',
     'tags',
     'comments',
+    'jobs',
 )
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -150,6 +152,16 @@ USE_I18N = True
 
 USE_TZ = True
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
@@ -158,6 +170,12 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
 
+# Unfinished chunked uploads are kept inside MEDIA_ROOT to be moved
+# into place without copying.
+CHUNKED_UPLOAD_DIR = 'chunked_uploads'
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+CHUNKED_UPLOAD_EXPIRATION = 60 * 60 * 24
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "users.User"
@@ -179,10 +197,44 @@ REST_FRAMEWORK = {
 IMAGES_RECOMENDED_SIZE = 8
 IMAGES_LIMIT_SIZE = 10
 MAX_NUM_OF_TAGS_RECOMENDED_COMBO = 4
+IMAGES_RECOMENDED_INDEX_SIZE = 100
+IMAGES_RECOMENDED_FANOUT_LIMIT = 1000
+TAG_COVER_POOL_SIZE = 10
+TAG_COVER_POOL_TIMEOUT = 60 * 60
+# Images of authors with more subscribers are merged into feeds on
+# reading instead of being copied into every timeline.
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL_SIZE = 100
 ALLOWED_EXTENSIONS = [
     'jpeg', 'jpg', 'png', 'webp', 'raw', 'tiff', 'psd', 'gif', 'svg'
 ]
 
+IMAGE_DERIVATIVES = {
+    'thumbnail': (400, 400),
+    'preview': (1280, 1280),
+}
+IMAGE_DERIVATIVE_FORMAT = 'WEBP'
+IMAGE_DERIVATIVE_QUALITY = 80
+
+# 'reject' refuses duplicate uploads, 'warn' lists them in the response
+# and 'link' also stores the closest one in `duplicate_of`.
+IMAGE_DUPLICATE_MODE = os.getenv('IMAGE_DUPLICATE_MODE', 'warn')
+IMAGE_DUPLICATE_DISTANCE = 4
+IMAGE_DUPLICATE_SYNC_OVERLAP = 60
+
+# 'stream' sends files from Django, 'accel' delegates them to nginx.
+IMAGE_DOWNLOAD_MODE = os.getenv('IMAGE_DOWNLOAD_MODE', 'stream')
+IMAGE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+# Downloads are written in bulk by a background thread, see images.downloads.
+IMAGE_DOWNLOADS_BUFFER_SIZE = 100
+IMAGE_DOWNLOADS_FLUSH_INTERVAL = 5
+
+JOBS_ALWAYS_EAGER = os.getenv('JOBS_ALWAYS_EAGER', 'False') == 'True'
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 30
+JOBS_POLL_INTERVAL = 1
+JOBS_LOCK_TIMEOUT = 600
+
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 EMAIL_BACKEND_NAME = "Anonim-not-found@yandex.ru"
@@ -190,6 +242,10 @@ EMAIL_BACKEND_NAME = "Anonim-not-found@yandex.ru"
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
 }
+JWT_USER_CACHE_TIMEOUT = 60
+
+CONFIRMATION_CODE_LIFETIME = 60 * 15
+CONFIRMATION_CODE_MAX_ATTEMPTS = 5
 
 white_list = [
     'http://127.0.0.1:8000/',
@@ -237,6 +293,11 @@ SOCIAL_AUTH_YANDEX_OAUTH2_SECRET = os.getenv('YANDEX_SECRET')
 
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 GOOGLE_PROJECT_CX = os.getenv('GOOGLE_PROJECT_CX')
+GOOGLE_SEARCH_URL = os.getenv(
+    'GOOGLE_SEARCH_URL', 'https://www.googleapis.com/customsearch/v1'
+)
+IMAGE_IMPORT_THREADS = 8
+IMAGE_IMPORT_TIMEOUT = 10
 
 os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
 LOGS_DIR = os.path.join(BASE_DIR, 'logs', 'marketgraphicimages.log')
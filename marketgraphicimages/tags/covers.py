@@ -0,0 +1,70 @@
+import random
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.transaction import on_commit_once
+from images.models import Image
+
+POOL_KEY = 'tag_cover_pool:{}'
+
+
+def refresh_tag_cover_pools(tag_ids) -> dict:
+    """
+    Stores the ids of the latest images of every tag in the cache.
+
+    Args:
+        tag_ids: Ids of tags.
+
+    Returns:
+        dict: Tag id mapped to the list of candidate image ids.
+    """
+    pools = {
+        tag_id: list(
+            Image.objects.filter(tags=tag_id).values_list(
+                'id', flat=True
+            )[:settings.TAG_COVER_POOL_SIZE]
+        )
+        for tag_id in tag_ids
+    }
+    cache.set_many(
+        {POOL_KEY.format(tag_id): pool for tag_id, pool in pools.items()},
+        settings.TAG_COVER_POOL_TIMEOUT,
+    )
+    return pools
+
+
+def get_tag_covers(tag_ids) -> dict:
+    """
+    Picks a random cover image for every tag from its cached pool.
+
+    Args:
+        tag_ids: Ids of tags.
+
+    Returns:
+        dict: Tag id mapped to the id of the cover image. Tags without
+        images are omitted.
+    """
+    cached = cache.get_many([POOL_KEY.format(tag_id) for tag_id in tag_ids])
+    pools = {
+        tag_id: cached[POOL_KEY.format(tag_id)]
+        for tag_id in tag_ids
+        if POOL_KEY.format(tag_id) in cached
+    }
+    missing = [tag_id for tag_id in tag_ids if tag_id not in pools]
+    if missing:
+        pools.update(refresh_tag_cover_pools(missing))
+    return {
+        tag_id: random.choice(pool)
+        for tag_id, pool in pools.items()
+        if pool
+    }
+
+
+def schedule_tag_cover_refresh(tag_id: int) -> None:
+    """Refreshes the cover pool of the tag once the transaction commits."""
+    on_commit_once(
+        ('tag_cover_pool', tag_id),
+        partial(refresh_tag_cover_pools, (tag_id,)),
+    )
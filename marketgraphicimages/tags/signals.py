@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from core.response_cache import IMAGES, invalidate_responses
+from images.models import Image
+from tags.models import Tag
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    """Invalidates the cached responses and ETags showing the tag."""
+    Image.objects.filter(tags=instance).touch()
+    invalidate_responses(IMAGES)
@@ -0,0 +1,44 @@
+from django.db import models
+from django.db.models.functions import Greatest
+
+from core.authentication import invalidate_cached_user_on_commit
+from images.counters import count_subquery
+from images.models import Image
+from users.models import Subscription, User
+
+
+def change_user_counter(user_id: int, field: str, delta: int = 1) -> None:
+    """
+    Atomically changes a profile counter of the user by `delta` and
+    drops the cached user of JWT authentication.
+
+    Args:
+        user_id (int): Id of the user.
+        field (str): Name of the counter field.
+        delta (int, optional): Value to add to the counter.
+    """
+    User.objects.filter(pk=user_id).update(
+        **{field: Greatest(models.F(field) + delta, 0)}
+    )
+    invalidate_cached_user_on_commit(user_id)
+
+
+def recount_user_counters(users: models.QuerySet = None) -> int:
+    """
+    Recalculates the profile counters of the users, of all users by
+    default.
+
+    Returns:
+        int: The number of updated users.
+    """
+    if users is None:
+        users = User.objects.all()
+    return users.update(
+        images_count=count_subquery(Image.objects.all(), 'author'),
+        subscribers_count=count_subquery(
+            Subscription.objects.all(), 'author'
+        ),
+        subscriptions_count=count_subquery(
+            Subscription.objects.all(), 'subscriber'
+        ),
+    )
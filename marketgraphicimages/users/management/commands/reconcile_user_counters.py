@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from users.counters import recount_user_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculates images, subscribers and subscriptions counters '
+        'of users.'
+    )
+
+    def handle(self, *args, **kwargs):
+        updated = recount_user_counters()
+        print(f'Done! Users updated: {updated}')
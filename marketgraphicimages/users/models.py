@@ -4,6 +4,7 @@ from django.core.validators import (
     MinLengthValidator,
 )
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from core.validators import validate_email
@@ -12,6 +13,7 @@ ROLE_CHOICES = (
         ('User', 'User'),
         ('Author', 'Author'),
     )
+COUNTERS = ('images_count', 'subscribers_count', 'subscriptions_count')
 
 
 class User(AbstractUser):
@@ -76,6 +78,18 @@ class User(AbstractUser):
         verbose_name=_('Website'),
         blank=True,
     )
+    images_count = models.PositiveIntegerField(
+        verbose_name=_('Images count'),
+        default=0,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name=_('Subscribers count'),
+        default=0,
+    )
+    subscriptions_count = models.PositiveIntegerField(
+        verbose_name=_('Subscriptions count'),
+        default=0,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username',)
@@ -94,6 +108,20 @@ class User(AbstractUser):
     def __str__(self):
         return self.username[:15]
 
+    def save(self, *args, **kwargs):
+        # The counters are changed by atomic updates only, so saving
+        # a loaded, possibly stale, user does not overwrite them.
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTERS
+            ]
+        super().save(*args, **kwargs)
+
     @property
     def is_author(self):
         return self.role == 'Author'
@@ -115,6 +143,15 @@ class ConfirmationCode(models.Model):
         verbose_name=_('Confirmation code'),
         max_length=100,
     )
+    created = models.DateTimeField(
+        verbose_name=_('Date of creation'),
+        default=timezone.now,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name=_('Attempts'),
+        default=0,
+        help_text=_('Number of checks of the code'),
+    )
 
     class Meta:
         verbose_name = _('Confirmation code')
@@ -179,6 +216,15 @@ class UserConfirmationCode(models.Model):
         default=False,
         verbose_name=_('Is confirmed'),
     )
+    created = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Date of creation'),
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_('Attempts'),
+        help_text=_('Number of checks of the code'),
+    )
 
     class Meta:
         verbose_name = _('User confirmation code')
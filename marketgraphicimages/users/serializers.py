@@ -4,7 +4,7 @@ from django.core import exceptions as django_exceptions
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from core.encryption_str import verify_value
+from core.confirmation_code import check_confirmation_code, is_code_expired
 
 User = get_user_model()
 
@@ -26,8 +26,8 @@ class EmailAndTokenSerializer(serializers.Serializer):
                 {'email': _('invalid_email')},
             )
         data['user_confirm_code'] = user.code_owner.get()
-        if verify_value(confirmation_code,
-                        data['user_confirm_code'].confirmation_code):
+        if check_confirmation_code(data['user_confirm_code'],
+                                   confirmation_code):
             return data
         else:
             raise serializers.ValidationError(
@@ -58,6 +58,10 @@ class PasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 {'confirmation_code': _('confirmation code is not confirmed')}
             )
+        if is_code_expired(user.code_owner.get()):
+            raise serializers.ValidationError(
+                {'confirmation_code': _('confirmation code has expired')}
+            )
         try:
             validate_password(data["new_password"], user)
         except django_exceptions.ValidationError as e:
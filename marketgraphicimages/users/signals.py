@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.authentication import invalidate_cached_user_on_commit
+from images.feed import backfill_timeline, remove_from_timeline
+from jobs.queue import enqueue
+from users.counters import change_user_counter
+from users.models import Subscription, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """
+    Drops the cached user of JWT authentication, including after
+    password and role changes.
+    """
+    invalidate_cached_user_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    """
+    Increments the subscription counters of both users and adds the
+    latest images of the author to the subscriber's feed. The feed is
+    filled after the counters, which decide whether it is fanned out.
+    """
+    if created:
+        change_user_counter(instance.author_id, 'subscribers_count')
+        change_user_counter(instance.subscriber_id, 'subscriptions_count')
+        enqueue(
+            backfill_timeline,
+            user_id=instance.subscriber_id, author_id=instance.author_id,
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    """
+    Decrements the subscription counters of both users and removes the
+    images of the author from the subscriber's feed.
+    """
+    change_user_counter(instance.author_id, 'subscribers_count', -1)
+    change_user_counter(instance.subscriber_id, 'subscriptions_count', -1)
+    remove_from_timeline(instance.subscriber_id, instance.author_id)
@@ -1,7 +1,14 @@
+import pytest
 from django.utils.version import get_version
 
 assert (get_version()) == '4.2', 'Пожалуйста, используйте версию Django 4.2'
 
 pytest_plugins = [
     'tests.fixture_user',
+    'tests.fixture_image',
 ]
+
+
+@pytest.fixture(autouse=True)
+def jobs_always_eager(settings):
+    settings.JOBS_ALWAYS_EAGER = True
@@ -0,0 +1,108 @@
+import io
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from images.downloads import take_events
+from images.models import FavoriteImage, Image
+from tags.models import Tag
+
+
+def make_image_file(name='image.png', size=(8, 8), color='red',
+                    img_format='PNG'):
+    buffer = io.BytesIO()
+    PILImage.new('RGB', size, color).save(buffer, format=img_format)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), content_type=f'image/{img_format.lower()}'
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def download_buffer(settings):
+    settings.IMAGE_DOWNLOADS_FLUSH_INTERVAL = None
+    yield
+    take_events()
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='TestAuthor',
+        email='testauthor@pictura.fake',
+        password='TestAuthor',
+        role='Author',
+    )
+
+
+@pytest.fixture
+def viewer(django_user_model):
+    return django_user_model.objects.create_user(
+        username='TestViewer',
+        email='testviewer@pictura.fake',
+        password='TestViewer',
+    )
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.cookies['jwt'] = str(AccessToken.for_user(author))
+    return client
+
+
+@pytest.fixture
+def viewer_client(viewer):
+    client = APIClient()
+    client.cookies['jwt'] = str(AccessToken.for_user(viewer))
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=f'Тег {num}', slug=f'tag-{num}')
+        for num in range(3)
+    ]
+
+
+@pytest.fixture
+def create_images(author, tags):
+    def create(count, **kwargs):
+        images = []
+        for num in range(count):
+            image = Image.objects.create(
+                author=kwargs.get('author', author),
+                name=f'Image {num}',
+                image=make_image_file(f'image_{num}.png'),
+                license=kwargs.get('license', Image.LicenseType.FREE),
+                price=0,
+            )
+            image.tags.set(kwargs.get('tags', tags[:1]))
+            images.append(image)
+        return images
+    return create
+
+
+@pytest.fixture
+def favorite_images(viewer, create_images):
+    images = create_images(3)
+    for image in images[:2]:
+        FavoriteImage.objects.create(image=image, user=viewer)
+    return images
@@ -1,8 +1,24 @@
+from datetime import timedelta
 from http import HTTPStatus
 
 import pytest
 from django.core import mail
-from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.v1.serializers import AuthorSerializer
+from core.authentication import get_user_cache_stats
+from core.confirmation_code import check_confirmation_code
+from core.encryption_str import (
+    HMAC_PREFIX,
+    hash_value,
+    pwd_context,
+    verify_value,
+)
+from users.models import Subscription, UserConfirmationCode
 
 
 @pytest.mark.django_db(transaction=True)
@@ -196,4 +212,259 @@ class Test00UserSetResetPassword:
         assert outbox_before_count + 1 == outbox_after_count, (
             f'Проверьте, что POST-запрос к `{self.url_reset_password}` '
             'с корректными данными отправляет письмо на почту.'
-        )
\ No newline at end of file
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test01UserCache:
+    url_me = '/api/v1/users/me/'
+
+    def get_user_queries(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url_me)
+        assert response.status_code == HTTPStatus.OK
+        return [
+            query for query in context.captured_queries
+            if 'FROM "users_user" WHERE "users_user"."id"' in query['sql']
+        ], response
+
+    def test_00_cached_user(self, viewer, viewer_client):
+        stats = get_user_cache_stats()
+        queries, _ = self.get_user_queries(viewer_client)
+        assert len(queries) == 1
+        queries, _ = self.get_user_queries(viewer_client)
+        assert not queries, (
+            'Пользователь из JWT должен браться из кэша.'
+        )
+        new_stats = get_user_cache_stats()
+        assert new_stats['hits'] - stats['hits'] == 1
+        assert new_stats['misses'] - stats['misses'] == 1
+
+        viewer.role = 'Author'
+        viewer.save()
+        queries, response = self.get_user_queries(viewer_client)
+        assert len(queries) == 1, (
+            'Кэш пользователя должен сбрасываться при сохранении.'
+        )
+        assert response.json()['role'] == 'Author'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test02UserCounters:
+    url_me = '/api/v1/users/me/'
+
+    def subscribe(self, subscriber, author):
+        return Subscription.objects.create(
+            user=subscriber, subscriber=subscriber, author=author
+        )
+
+    def test_00_me_queries(self, author, viewer, author_client,
+                           django_user_model, create_images):
+        create_images(5)
+        self.subscribe(viewer, author)
+        self.subscribe(author, viewer)
+        author_client.get(self.url_me)
+        with CaptureQueriesContext(connection) as context:
+            response = author_client.get(self.url_me)
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert (
+            data['count_my_images'], data['my_subscribers'],
+            data['my_subscriptions'],
+        ) == (5, 1, 1), 'Счётчики профиля должны быть актуальными.'
+        assert len(context.captured_queries) == 0, (
+            'Статистика профиля не должна требовать запросов к базе.'
+        )
+        for num in range(3):
+            self.subscribe(django_user_model.objects.create_user(
+                username=f'Follower{num}',
+                email=f'follower{num}@pictura.fake',
+                password='Follower',
+            ), author)
+        with CaptureQueriesContext(connection) as context:
+            response = author_client.get(self.url_me)
+        assert response.json()['my_subscribers'] == 4
+        assert len(context.captured_queries) == 1, (
+            'Число запросов к `/users/me/` не должно зависеть от числа '
+            'изображений и подписок.'
+        )
+
+    def test_01_counters(self, author, viewer, django_user_model,
+                         create_images):
+        stale_author = django_user_model.objects.get(id=author.id)
+        images = create_images(2)
+        subscription = self.subscribe(viewer, author)
+        stale_author.first_name = 'Stale'
+        stale_author.save()
+        author.refresh_from_db()
+        assert (author.images_count, author.subscribers_count) == (2, 1), (
+            'Сохранение пользователя не должно перезаписывать счётчики.'
+        )
+        images[0].delete()
+        subscription.delete()
+        author.refresh_from_db()
+        viewer.refresh_from_db()
+        assert (
+            author.images_count, author.subscribers_count,
+            viewer.subscriptions_count,
+        ) == (1, 0, 0), 'Удаление должно уменьшать счётчики.'
+        django_user_model.objects.update(images_count=0)
+        call_command('reconcile_user_counters')
+        author.refresh_from_db()
+        assert author.images_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+class Test03AuthorSerializer:
+    url_images = '/api/v1/image/'
+
+    def test_00_subscriptions_in_one_query(self, viewer, django_user_model):
+        authors = [
+            django_user_model.objects.create_user(
+                username=f'Author{num}',
+                email=f'author{num}@pictura.fake',
+                password='Author',
+                role='Author',
+            )
+            for num in range(4)
+        ]
+        for author in authors[:2]:
+            Subscription.objects.create(
+                user=viewer, subscriber=viewer, author=author
+            )
+        request = APIRequestFactory().get('/')
+        request.user = viewer
+        with CaptureQueriesContext(connection) as context:
+            data = AuthorSerializer(
+                authors, many=True, context={'request': request}
+            ).data
+        assert [author['is_subscribed'] for author in data] == [
+            True, True, False, False
+        ]
+        assert len(context.captured_queries) == 1, (
+            'Подписки на всех авторов списка должны определяться одним '
+            'запросом.'
+        )
+
+    def test_01_image_author(self, author, viewer, viewer_client,
+                             create_images):
+        image = create_images(2)[0]
+        Subscription.objects.create(
+            user=viewer, subscriber=viewer, author=author
+        )
+        response = viewer_client.get(f'{self.url_images}{image.id}/')
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()['author']['is_subscribed'] is True
+        assert response.json()['author']['num_of_author_images'] == 2
+
+
+@pytest.mark.django_db(transaction=True)
+class Test04Subscriptions:
+    url_subscribe = '/api/v1/users/{}/subscribe/'
+    url_subscribers = '/api/v1/users/{}/subscribers/'
+    url_subscriptions = '/api/v1/users/{}/subscriptions/'
+
+    def test_00_subscribe_and_unsubscribe(self, author, viewer,
+                                          viewer_client):
+        url = self.url_subscribe.format(author.id)
+        response = viewer_client.post(url)
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        assert response.json()['is_subscribed'] is True
+        assert viewer_client.post(url).status_code == (
+            HTTPStatus.BAD_REQUEST
+        ), 'Повторная подписка должна возвращать ошибку.'
+        assert viewer_client.post(
+            self.url_subscribe.format(viewer.id)
+        ).status_code == HTTPStatus.BAD_REQUEST, (
+            'Подписка на самого себя должна возвращать ошибку.'
+        )
+        author.refresh_from_db()
+        viewer.refresh_from_db()
+        assert (author.subscribers_count, viewer.subscriptions_count) == (
+            1, 1
+        ), 'Счётчики подписок должны обновляться вместе с подпиской.'
+
+        assert viewer_client.delete(url).status_code == HTTPStatus.NO_CONTENT
+        assert viewer_client.delete(url).status_code == (
+            HTTPStatus.BAD_REQUEST
+        )
+        author.refresh_from_db()
+        viewer.refresh_from_db()
+        assert (author.subscribers_count, viewer.subscriptions_count) == (
+            0, 0
+        )
+
+    def test_01_cursor_lists(self, author, viewer, viewer_client,
+                             django_user_model):
+        followers = [
+            django_user_model.objects.create_user(
+                username=f'Follower{num}',
+                email=f'follower{num}@pictura.fake',
+                password='Follower',
+            )
+            for num in range(3)
+        ]
+        for follower in followers:
+            Subscription.objects.create(
+                user=follower, subscriber=follower, author=author
+            )
+        Subscription.objects.create(
+            user=viewer, subscriber=viewer, author=followers[0]
+        )
+        response = viewer_client.get(
+            self.url_subscribers.format(author.id), {'limit': 2}
+        )
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [user['id'] for user in data['results']] == [
+            followers[2].id, followers[1].id
+        ], 'Подписчики должны возвращаться от последних к первым.'
+        with CaptureQueriesContext(connection) as context:
+            data = viewer_client.get(data['next']).json()
+        assert [user['id'] for user in data['results']] == [followers[0].id]
+        assert data['results'][0]['is_subscribed'] is True
+        assert data['next'] is None
+        assert len(context.captured_queries) <= 3, (
+            'Страница подписчиков не должна выполнять запросы для каждого '
+            'пользователя.'
+        )
+        response = viewer_client.get(
+            self.url_subscriptions.format(followers[0].id)
+        )
+        assert [user['id'] for user in response.json()['results']] == [
+            author.id
+        ]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test05ConfirmationCodes:
+
+    def test_00_hashing(self):
+        hashed = hash_value('123456')
+        assert hashed.startswith(HMAC_PREFIX), (
+            'Коды подтверждения должны хешироваться с помощью HMAC.'
+        )
+        assert verify_value('123456', hashed)
+        assert not verify_value('654321', hashed)
+        assert verify_value('123456', pwd_context.hash('123456')), (
+            'Коды, сохранённые до перехода на HMAC, должны проверяться.'
+        )
+
+    def test_01_attempts_and_expiry(self, viewer, settings):
+        settings.CONFIRMATION_CODE_MAX_ATTEMPTS = 2
+        confirmation = UserConfirmationCode.objects.create(
+            user=viewer, confirmation_code=hash_value('123456')
+        )
+        assert not check_confirmation_code(confirmation, '000000')
+        assert check_confirmation_code(confirmation, '123456')
+        assert not check_confirmation_code(confirmation, '123456'), (
+            'После исчерпания попыток код не должен приниматься.'
+        )
+        confirmation.attempts = 0
+        confirmation.created = timezone.now() - timedelta(
+            seconds=settings.CONFIRMATION_CODE_LIFETIME + 1
+        )
+        confirmation.save()
+        assert not check_confirmation_code(confirmation, '123456'), (
+            'Просроченный код не должен приниматься.'
+        )
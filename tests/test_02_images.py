@@ -0,0 +1,1029 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .fixture_image import make_image_file
+from comments.models import Comment
+from core.image_from_google import fetch_images, get_session
+from core.image_hash import BKTree
+from core.metrics import RequestMetrics, reset_view_metrics
+from core.synthetic import render_synthetic_image
+from images.downloads import flush_downloads, stop_flusher
+from images.models import (
+    DownloadImage,
+    FavoriteImage,
+    Image,
+    ImageUpload,
+    RecommendedImage,
+    TagImage,
+    TimelineEntry,
+)
+from jobs.queue import work
+from users.models import Subscription
+
+
+@pytest.mark.django_db(transaction=True)
+class Test02ImageList:
+    url_images = '/api/v1/image/'
+
+    def get_num_queries(self, client, limit):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url_images, {'limit': limit})
+        assert response.status_code == HTTPStatus.OK, (
+            f'Эндпоинт `{self.url_images}` должен быть доступен.'
+        )
+        assert len(response.json()['results']) == limit
+        return len(context.captured_queries)
+
+    def test_00_num_queries_independent_of_page_size(
+        self, viewer_client, favorite_images, create_images
+    ):
+        create_images(5)
+        # Warm up the cache of the authenticated user.
+        viewer_client.get(self.url_images)
+        small_page = self.get_num_queries(viewer_client, 1)
+        big_page = self.get_num_queries(viewer_client, 8)
+        assert small_page == big_page, (
+            f'Количество запросов к БД на эндпоинте `{self.url_images}` '
+            'не должно зависеть от размера страницы: '
+            f'{small_page} != {big_page}.'
+        )
+
+    def test_01_anonymous_num_queries_independent_of_page_size(
+        self, client, create_images
+    ):
+        create_images(6)
+        assert (self.get_num_queries(client, 1)
+                == self.get_num_queries(client, 6)), (
+            f'Количество запросов к БД на эндпоинте `{self.url_images}` '
+            'для анонимного пользователя не должно зависеть от размера '
+            'страницы.'
+        )
+
+    def test_02_is_favorited(self, viewer_client, favorite_images):
+        response = viewer_client.get(self.url_images)
+        favorited = {
+            image['id']: image['is_favorited']
+            for image in response.json()['results']
+        }
+        expected = {
+            image.id: num < 2 for num, image in enumerate(favorite_images)
+        }
+        assert favorited == expected, (
+            f'Поле `is_favorited` на эндпоинте `{self.url_images}` должно '
+            'отражать наличие изображения в избранном пользователя.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test03ImageRecommendations:
+    url_image = '/api/v1/image/{}/'
+
+    def test_00_recommendations_ranking(self, client, create_images, tags):
+        first, second, third = tags
+        image, same_tags = create_images(2, tags=tags)
+        two_tags, = create_images(1, tags=(first, second))
+        old_one_tag, = create_images(1, tags=(first,))
+        create_images(1, tags=(second,))
+        new_one_tag, = create_images(1, tags=(first,))
+
+        response = client.get(self.url_image.format(image.id))
+        assert response.status_code == HTTPStatus.OK
+        recommended = [item['id'] for item in response.json()['recommended']]
+        assert recommended == [
+            same_tags.id, two_tags.id, new_one_tag.id, old_one_tag.id
+        ], (
+            'Рекомендации должны быть упорядочены по количеству общих '
+            'популярных тегов, затем по дате создания.'
+        )
+
+    def test_01_recommendations_follow_tag_changes(
+        self, client, create_images, tags
+    ):
+        image, other = create_images(2, tags=tags[:1])
+        other.tags.set(tags[1:])
+
+        response = client.get(self.url_image.format(image.id))
+        assert response.json()['recommended'] == [], (
+            'После изменения тегов изображение не должно оставаться '
+            'в рекомендациях.'
+        )
+
+    def test_02_fan_out_keeps_index_size(
+        self, client, create_images, tags, settings
+    ):
+        settings.IMAGES_RECOMENDED_INDEX_SIZE = 2
+        image, = create_images(1, tags=tags[:1])
+        others = create_images(3, tags=tags[:1])
+
+        assert list(
+            RecommendedImage.objects.filter(image=image).order_by(
+                '-recommended__created'
+            ).values_list('recommended', flat=True)
+        ) == [others[2].id, others[1].id], (
+            'Новые изображения должны вытеснять из индекса рекомендаций '
+            'изображения за пределами `IMAGES_RECOMENDED_INDEX_SIZE`.'
+        )
+
+    def test_03_recommendations_pages(self, client, create_images, tags):
+        image, = create_images(1, tags=tags[:1])
+        create_images(4, tags=tags[:1])
+        url = self.url_image.format(image.id)
+        recommended = [
+            item['id'] for item in client.get(url).json()['recommended']
+        ]
+        response = client.get(url, {'limit': 2, 'offset': 3})
+        assert [
+            item['id'] for item in response.json()['recommended']
+        ] == recommended[3:5], (
+            'Рекомендации должны возвращать `limit` изображений, '
+            'начиная с `offset`.'
+        )
+        response = client.get(url, {'limit': 'abc', 'offset': -1})
+        assert response.status_code == HTTPStatus.OK, (
+            'Некорректные `limit` и `offset` не должны приводить к ошибке.'
+        )
+        assert [
+            item['id'] for item in response.json()['recommended']
+        ] == recommended
+
+
+@pytest.mark.django_db(transaction=True)
+class Test04ImageCounters:
+    url_favorite = '/api/v1/image/{}/favorite/'
+
+    def test_00_favorites_count(self, viewer_client, create_images):
+        image, = create_images(1)
+        url = self.url_favorite.format(image.id)
+
+        response = viewer_client.post(url)
+        assert response.status_code == HTTPStatus.CREATED
+        image.refresh_from_db()
+        assert image.favorites_count == 1, (
+            'Добавление в избранное должно увеличивать счётчик '
+            '`favorites_count`.'
+        )
+
+        viewer_client.delete(url)
+        image.refresh_from_db()
+        assert image.favorites_count == 0, (
+            'Удаление из избранного должно уменьшать счётчик '
+            '`favorites_count`.'
+        )
+
+    def test_01_comments_count(self, viewer, create_images):
+        image, = create_images(1)
+        comment = Comment.objects.create(
+            commented_post=image, commentator=viewer, text='Комментарий'
+        )
+        image.refresh_from_db()
+        assert image.comments_count == 1
+        comment.delete()
+        image.refresh_from_db()
+        assert image.comments_count == 0
+
+    def test_02_reconcile_counters(self, favorite_images):
+        Image.objects.update(favorites_count=10)
+        call_command('reconcile_image_counters')
+        assert sorted(
+            Image.objects.values_list('favorites_count', flat=True)
+        ) == [0, 1, 1], (
+            'Команда `reconcile_image_counters` должна пересчитывать '
+            'счётчики изображений.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test05ImageCursorPagination:
+    url_images = '/api/v1/image/'
+
+    def test_00_cursor_pages(self, client, create_images, viewer):
+        images = create_images(5)
+        create_images(2, author=viewer)
+        url = f'{self.url_images}?pagination=cursor&limit=2&author=' + str(
+            images[0].author_id
+        )
+        received = []
+        num_queries = set()
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            assert response.status_code == HTTPStatus.OK
+            assert not any(
+                'COUNT(' in query['sql']
+                for query in context.captured_queries
+            ), 'Курсорная пагинация не должна считать строки без запроса.'
+            num_queries.add(len(context.captured_queries))
+            data = response.json()
+            assert 'count' not in data
+            received.extend(image['id'] for image in data['results'])
+            url = data['next']
+        assert received == [image.id for image in reversed(images)], (
+            'Курсорная пагинация должна возвращать все изображения с '
+            'учётом фильтров, от новых к старым.'
+        )
+        assert len(num_queries) == 1, (
+            'Количество запросов к БД не должно зависеть от глубины '
+            'страницы.'
+        )
+
+    def test_01_cursor_exact_count(self, client, create_images):
+        create_images(3)
+        response = client.get(
+            self.url_images, {'pagination': 'cursor', 'count': 'exact'}
+        )
+        assert response.json()['count'] == 3
+
+
+@pytest.mark.django_db(transaction=True)
+class Test06ImageSearch:
+    url_images = '/api/v1/image/'
+
+    def search(self, client, value):
+        response = client.get(self.url_images, {'name': value})
+        assert response.status_code == HTTPStatus.OK
+        return [image['id'] for image in response.json()['results']]
+
+    def test_00_search_by_name_tags_and_author(
+        self, client, create_images, tags, viewer
+    ):
+        by_author, = create_images(1, tags=tags[2:])
+        by_tag, = create_images(1, author=viewer, tags=tags[1:2])
+        by_name, = create_images(1, author=viewer, tags=tags[2:])
+        by_name.name = 'Горный пейзаж'
+        by_name.save()
+
+        assert self.search(client, 'горн') == [by_name.id], (
+            'Поиск должен находить изображения по началу слова в названии.'
+        )
+        assert self.search(client, 'Тег 1') == [by_tag.id], (
+            'Поиск должен находить изображения по названию тега.'
+        )
+        assert self.search(client, 'testauth') == [by_author.id], (
+            'Поиск должен находить изображения по имени автора.'
+        )
+        assert self.search(client, 'несуществующее') == []
+
+    def test_01_search_ranking(self, client, create_images, tags):
+        image, other = create_images(2, tags=tags[:1])
+        image.name = 'Море море море'
+        image.save()
+        other.name = 'Море и горы'
+        other.save()
+        assert self.search(client, 'мор') == [image.id, other.id], (
+            'Результаты поиска должны быть упорядочены по релевантности.'
+        )
+
+    def test_02_author_rename(self, client, create_images, author):
+        image, = create_images(1)
+        with CaptureQueriesContext(connection) as context:
+            author.set_password('New_password1')
+            author.save()
+        assert not any(
+            'images_image' in query['sql']
+            for query in context.captured_queries
+        ), 'Сохранение автора без смены имени не должно трогать изображения.'
+        author.username = 'renamed_author'
+        author.save()
+        assert self.search(client, 'renamed_author') == [image.id], (
+            'После смены имени автора поиск должен находить его '
+            'изображения по новому имени.'
+        )
+
+    def test_02_benchmark_search(self, capsys):
+        call_command('benchmark_search', rows=200, queries=5)
+        output = capsys.readouterr().out
+        assert 'icontains' in output and 'full-text' in output
+        assert not Image.objects.exists(), (
+            'Команда `benchmark_search` должна откатывать созданные данные.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test07ImageFormat:
+    url_images = '/api/v1/image/'
+    svg = (b'<?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg"'
+           b' width="8" height="8"></svg>')
+
+    def create_image(self, author, image_file):
+        return Image.objects.create(
+            author=author, name='Image', image=image_file,
+            license=Image.LicenseType.FREE, price=0,
+        )
+
+    def test_00_detect_format(self, author):
+        images = {
+            'raster': self.create_image(
+                author, make_image_file('photo.jpg', img_format='JPEG')
+            ),
+            'gif': self.create_image(
+                author, make_image_file('animation.gif', img_format='GIF')
+            ),
+            'vector': self.create_image(
+                author, SimpleUploadedFile('vector.svg', self.svg)
+            ),
+            'mislabeled': self.create_image(
+                author, make_image_file('fake.svg', img_format='PNG')
+            ),
+            'jpeg': self.create_image(
+                author, make_image_file('photo.jpeg', img_format='JPEG')
+            ),
+            'mislabeled_jpeg': self.create_image(
+                author, make_image_file('photo.png', img_format='JPEG')
+            ),
+            'tiff': self.create_image(
+                author, make_image_file('scan.tiff', img_format='TIFF')
+            ),
+        }
+        formats = {
+            key: (image.category, image.extension)
+            for key, image in images.items()
+        }
+        assert formats == {
+            'raster': ('raster', 'JPG'),
+            'gif': ('gif', 'GIF'),
+            'vector': ('vector', 'SVG'),
+            'mislabeled': ('raster', 'PNG'),
+            'jpeg': ('raster', 'JPEG'),
+            'mislabeled_jpeg': ('raster', 'JPG'),
+            'tiff': ('raster', 'TIFF'),
+        }, (
+            'Формат изображения должен определяться по содержимому файла, '
+            'а `extension` совпадать с расширением правильно названного '
+            'файла.'
+        )
+
+    def test_01_filter_by_category(self, client, author):
+        self.create_image(author, make_image_file('photo.png'))
+        vector = self.create_image(
+            author, SimpleUploadedFile('vector.svg', self.svg)
+        )
+        response = client.get(self.url_images, {'category': 'vector_image'})
+        assert [image['id'] for image in response.json()['results']] == [
+            vector.id
+        ], 'Фильтр по категории должен использовать определённый формат.'
+
+    def test_02_backfill_formats(self, create_images):
+        image, = create_images(1)
+        Image.objects.update(category='', extension='')
+        call_command('backfill_image_formats')
+        image.refresh_from_db()
+        assert (image.category, image.extension) == ('raster', 'PNG'), (
+            'Команда `backfill_image_formats` должна заполнять формат '
+            'загруженных ранее изображений.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08ImageDerivatives:
+    url_images = '/api/v1/image/'
+    url_image = '/api/v1/image/{}/'
+
+    def test_00_derivatives_on_upload_and_replace(
+        self, author_client, tags
+    ):
+        response = author_client.post(self.url_images, data={
+            'name': 'Большое изображение',
+            'image': make_image_file('big.png', size=(2000, 1000)),
+            'license': 'free',
+            'price': 0,
+            'tags': [tags[0].id],
+        }, format='multipart')
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        data = response.json()
+        assert data['thumbnail'].endswith('.webp'), (
+            'При загрузке изображения должна создаваться миниатюра.'
+        )
+        assert (data['thumbnail_width'], data['thumbnail_height']) == (
+            400, 200
+        )
+        assert (data['preview_width'], data['preview_height']) == (1280, 640)
+
+        response = author_client.get(self.url_images)
+        assert response.json()['results'][0]['thumbnail'] == (
+            data['thumbnail']
+        ), 'Список изображений должен содержать ссылку на миниатюру.'
+
+        response = author_client.patch(
+            self.url_image.format(data['id']),
+            data={'image': make_image_file('tall.png', size=(100, 800))},
+            format='multipart',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        data = response.json()
+        assert (data['thumbnail_width'], data['thumbnail_height']) == (
+            50, 400
+        ), 'При замене изображения миниатюра должна пересоздаваться.'
+
+
+@pytest.mark.django_db(transaction=True)
+class Test09ImageDownload:
+    url_download = '/api/v1/image/{}/download/'
+
+    def test_00_range_download(self, viewer_client, create_images):
+        image, = create_images(1)
+        url = self.url_download.format(image.id)
+        content = image.image.open('rb').read()
+        response = viewer_client.get(url)
+        assert response.status_code == HTTPStatus.OK
+        assert b''.join(response.streaming_content) == content, (
+            'Эндпоинт скачивания должен отдавать файл целиком.'
+        )
+        response = viewer_client.get(url, HTTP_RANGE='bytes=10-19')
+        assert response.status_code == HTTPStatus.PARTIAL_CONTENT, (
+            'Эндпоинт скачивания должен поддерживать заголовок `Range`.'
+        )
+        assert response['Content-Range'] == f'bytes 10-19/{len(content)}'
+        assert b''.join(response.streaming_content) == content[10:20]
+        response = viewer_client.get(
+            url, HTTP_RANGE=f'bytes={len(content)}-'
+        )
+        assert response.status_code == (
+            HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+
+    def test_01_accel_download(self, viewer_client, create_images, settings):
+        settings.IMAGE_DOWNLOAD_MODE = 'accel'
+        image, = create_images(1)
+        response = viewer_client.get(self.url_download.format(image.id))
+        assert response.status_code == HTTPStatus.OK
+        assert response['X-Accel-Redirect'] == (
+            f'/protected-media/{image.image.name}'
+        ), 'В режиме `accel` файл должен отдавать nginx.'
+        assert not response.content
+
+    def test_02_buffered_history(
+        self, client, viewer_client, viewer, create_images
+    ):
+        image, = create_images(1)
+        url = self.url_download.format(image.id)
+        with CaptureQueriesContext(connection) as context:
+            viewer_client.get(url)
+        assert not any(
+            'images_downloadimage' in query['sql']
+            for query in context.captured_queries
+        ), 'Скачивание не должно записываться в историю во время запроса.'
+        viewer_client.get(url)
+        client.get(url)
+        assert flush_downloads() == 3
+        assert list(
+            image.downloadimage_set.values_list('user', flat=True)
+        ) == [viewer.id], (
+            'Повторные скачивания должны записываться в историю один раз.'
+        )
+        image.refresh_from_db()
+        assert image.downloads_count == 3, (
+            'Каждое скачивание должно увеличивать счётчик `downloads_count`.'
+        )
+
+    def test_03_background_flush(self, viewer_client, create_images, settings):
+        settings.IMAGE_DOWNLOADS_FLUSH_INTERVAL = 0.05
+        image, = create_images(1)
+        try:
+            viewer_client.get(self.url_download.format(image.id))
+            for _ in range(100):
+                image.refresh_from_db()
+                if image.downloads_count:
+                    break
+                time.sleep(0.05)
+        finally:
+            stop_flusher(timeout=5)
+        assert image.downloads_count == 1, (
+            'Буфер скачиваний должен записываться фоновым потоком '
+            'без новых скачиваний.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test10ResponseCache:
+    url_images = '/api/v1/image/'
+    url_image = '/api/v1/image/{}/'
+
+    def get_num_queries(self, client, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, params)
+        assert response.status_code == HTTPStatus.OK
+        return len(context.captured_queries), response.json()
+
+    def test_00_anonymous_responses_cached(self, client, create_images):
+        image, = create_images(1)
+        for url in (self.url_images, self.url_image.format(image.id)):
+            self.get_num_queries(client, url)
+            num_queries, _ = self.get_num_queries(client, url)
+            assert num_queries == 0, (
+                f'Ответ эндпоинта `{url}` анонимному пользователю '
+                'должен браться из кэша.'
+            )
+        num_queries, _ = self.get_num_queries(
+            client, self.url_images, {'name': 'Image'}
+        )
+        assert num_queries, 'Ключ кэша должен зависеть от параметров запроса.'
+
+    def test_01_invalidation(self, client, viewer, create_images):
+        image, = create_images(1)
+        url = self.url_image.format(image.id)
+        self.get_num_queries(client, url)
+        FavoriteImage.objects.create(image=image, user=viewer)
+        _, data = self.get_num_queries(client, url)
+        assert data['in_favorites'] == 1, (
+            'Добавление в избранное должно сбрасывать кэш ответов.'
+        )
+        image.name = 'Новое название'
+        image.save()
+        _, data = self.get_num_queries(client, self.url_images)
+        assert data['results'][0]['name'] == 'Новое название', (
+            'Изменение изображения должно сбрасывать кэш ответов.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test11ConditionalGet:
+    url_images = '/api/v1/image/'
+    url_image = '/api/v1/image/{}/'
+
+    def test_00_not_modified(self, viewer_client, viewer, create_images):
+        image, = create_images(1)
+        for url in (self.url_images, self.url_image.format(image.id)):
+            response = viewer_client.get(url)
+            etag = response['ETag']
+            assert etag and response['Last-Modified'], (
+                f'Эндпоинт `{url}` должен возвращать `ETag` и '
+                '`Last-Modified`.'
+            )
+            response = viewer_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Эндпоинт `{url}` должен возвращать 304 для '
+                'неизменённых данных.'
+            )
+            FavoriteImage.objects.create(image=image, user=viewer)
+            response = viewer_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == HTTPStatus.OK, (
+                f'ETag эндпоинта `{url}` должен меняться вместе со '
+                'счётчиками изображения.'
+            )
+            FavoriteImage.objects.all().delete()
+
+    def test_01_etag_depends_on_tags(self, client, create_images, tags):
+        image, = create_images(1)
+        url = self.url_image.format(image.id)
+        etag = client.get(url)['ETag']
+        image.tags.add(tags[1])
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+            HTTPStatus.OK
+        ), 'ETag должен меняться при изменении тегов изображения.'
+
+    def test_02_etag_depends_on_author(self, author, viewer_client,
+                                       create_images):
+        image, = create_images(1)
+        url = self.url_image.format(image.id)
+        etag = viewer_client.get(url)['ETag']
+        response = viewer_client.post(f'/api/v1/users/{author.id}/subscribe/')
+        assert response.status_code == HTTPStatus.CREATED
+        response = viewer_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'ETag должен меняться при подписке на автора изображения.'
+        )
+        assert response.json()['author']['is_subscribed'] is True
+        etag = response['ETag']
+        create_images(1)
+        response = viewer_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            'ETag должен меняться при изменении числа изображений автора.'
+        )
+
+    def test_03_malformed_pk(self, client, viewer_client):
+        for api_client in (client, viewer_client):
+            response = api_client.get(self.url_image.format('abc'))
+            assert response.status_code == HTTPStatus.NOT_FOUND, (
+                'Запрос изображения с нечисловым id должен возвращать 404.'
+            )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test12ImageDuplicates:
+    url_images = '/api/v1/image/'
+
+    def make_gradient(self, name, size, img_format='PNG'):
+        buffer = io.BytesIO()
+        image = PILImage.linear_gradient('L').resize(size).convert('RGB')
+        image.save(buffer, format=img_format)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def upload(self, client, image_file, tags):
+        return client.post(self.url_images, data={
+            'name': 'Градиент',
+            'image': image_file,
+            'license': 'free',
+            'price': 0,
+            'tags': [tags[0].id],
+        }, format='multipart')
+
+    def test_00_bk_tree(self):
+        tree = BKTree()
+        hashes = ['0000000000000000', '0000000000000003',
+                  'ffffffffffffffff', '00000000000000ff']
+        for num, dhash in enumerate(hashes):
+            tree.add(dhash, num)
+        found = [
+            (distance, items)
+            for distance, _, items in tree.search('0000000000000001', 2)
+        ]
+        assert found == [(1, {0}), (1, {1})], (
+            'BK-дерево должно находить хеши в пределах расстояния Хэмминга.'
+        )
+
+    @pytest.mark.parametrize('mode', ('warn', 'link', 'reject'))
+    def test_01_duplicate_upload(self, author_client, tags, settings, mode):
+        settings.IMAGE_DUPLICATE_MODE = mode
+        response = self.upload(
+            author_client, self.make_gradient('first.png', (256, 256)), tags
+        )
+        original_id = response.json()['id']
+        response = self.upload(
+            author_client,
+            self.make_gradient('copy.jpg', (300, 300), img_format='JPEG'),
+            tags,
+        )
+        if mode == 'reject':
+            assert response.status_code == HTTPStatus.BAD_REQUEST, (
+                'В режиме `reject` дубликат не должен загружаться.'
+            )
+            return
+        assert response.status_code == HTTPStatus.CREATED
+        data = response.json()
+        assert data['duplicates'] == [original_id], (
+            'Загрузка должна находить ранее загруженную копию изображения.'
+        )
+        copy = Image.objects.get(id=data['id'])
+        assert copy.duplicate_of_id == (
+            original_id if mode == 'link' else None
+        )
+
+    def test_02_backfill_hashes(self, create_images):
+        image, = create_images(1)
+        dhash = Image.objects.get(id=image.id).dhash
+        assert len(dhash) == 16
+        Image.objects.update(dhash='')
+        call_command('backfill_image_hashes')
+        assert Image.objects.get(id=image.id).dhash == dhash, (
+            'Команда `backfill_image_hashes` должна заполнять хеши.'
+        )
+
+    def test_03_decompression_bomb(self, author_client, tags, monkeypatch):
+        monkeypatch.setattr(PILImage, 'MAX_IMAGE_PIXELS', 100)
+        response = self.upload(
+            author_client, self.make_gradient('bomb.png', (64, 64)), tags
+        )
+        assert response.status_code == HTTPStatus.CREATED, (
+            'Изображение больше `MAX_IMAGE_PIXELS` должно загружаться '
+            'без хеша и уменьшенных копий.'
+        )
+        image = Image.objects.get(id=response.json()['id'])
+        assert (image.dhash, image.extension) == ('', 'PNG')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test13ChunkedUpload:
+    url_uploads = '/api/v1/image-uploads/'
+    url_upload = '/api/v1/image-uploads/{}/'
+
+    def put_chunk(self, client, upload_id, offset, data):
+        return client.put(
+            self.url_upload.format(upload_id) + 'chunk/', data=data,
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_00_chunked_upload(self, author_client, tags, media_root):
+        content = make_image_file('big.png', size=(300, 200)).read()
+        response = author_client.post(self.url_uploads, data={
+            'filename': 'big.png', 'size': len(content),
+        }, format='json')
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        upload_id = response.json()['id']
+        middle = len(content) // 2
+
+        response = self.put_chunk(
+            author_client, upload_id, 0, content[:middle]
+        )
+        assert response.json()['offset'] == middle
+        response = self.put_chunk(
+            author_client, upload_id, 0, content[middle:]
+        )
+        assert response.status_code == HTTPStatus.CONFLICT, (
+            'Фрагмент с неверным смещением должен отклоняться.'
+        )
+        response = author_client.get(self.url_upload.format(upload_id))
+        assert response.json()['offset'] == middle, (
+            'Загрузку должно быть можно продолжить с полученного смещения.'
+        )
+        response = self.put_chunk(
+            author_client, upload_id, middle, content[middle:] + b'x'
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        self.put_chunk(author_client, upload_id, middle, content[middle:])
+
+        response = author_client.post(
+            self.url_upload.format(upload_id) + 'finalize/', data={
+                'name': 'Большой файл', 'license': 'free', 'price': 0,
+                'tags': [tags[0].id],
+            }, format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        image = Image.objects.get(id=response.json()['id'])
+        assert image.image.read() == content, (
+            'Изображение должно собираться из загруженных фрагментов.'
+        )
+        assert image.extension == 'PNG'
+        assert not os.listdir(os.path.join(media_root, 'chunked_uploads'))
+        assert not ImageUpload.objects.exists()
+
+    def test_01_incomplete_upload(self, author_client, viewer_client):
+        response = author_client.post(self.url_uploads, data={
+            'filename': 'big.png', 'size': 10,
+        }, format='json')
+        url = self.url_upload.format(response.json()['id'])
+        assert viewer_client.get(url).status_code in (
+            HTTPStatus.FORBIDDEN, HTTPStatus.NOT_FOUND
+        ), 'Загрузка должна быть доступна только её автору.'
+        response = author_client.post(url + 'finalize/', data={})
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Незавершённую загрузку нельзя превратить в изображение.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test14SyntheticData:
+
+    def test_00_load_synthetic_catalog(self, tmp_path):
+        call_command(
+            'load_test_data', synthetic=True, users=4, images=12,
+            tags_per_image=2, favorites_per_user=3, downloads_per_user=2,
+            subscriptions_per_user=2, image_size=32, processes=2, seed=7,
+        )
+        images = Image.objects.filter(image__startswith='images/synthetic/')
+        assert images.count() == 12
+        assert TagImage.objects.filter(image__in=images).count() == 24
+        assert FavoriteImage.objects.count() == 12
+        assert sum(images.values_list('favorites_count', flat=True)) == 12, (
+            'Счётчики должны совпадать с созданными связями.'
+        )
+        assert DownloadImage.objects.count() == 8
+        assert Subscription.objects.count() == 8
+        image = images.order_by('id').first()
+        assert image.image.size > 0
+        task = (7, 0, 32, str(tmp_path / 'copy.png'))
+        assert render_synthetic_image(task) == image.dhash, (
+            'Генерация с одинаковым seed должна быть детерминированной.'
+        )
+
+
+class GoogleStandInHandler(BaseHTTPRequestHandler):
+    """Serves search results and images in place of the Google API."""
+
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.requests.append(url.path)
+        if url.path == '/search':
+            params = parse_qs(url.query)
+            key = hashlib.md5(params['q'][0].encode()).hexdigest()[:8]
+            start = int(params['start'][0])
+            body = json.dumps({'items': [
+                {'link': f'http://{self.headers["Host"]}/img/{key}_{num}'
+                         f'.{"bmp" if num == 1 else "png"}'}
+                for num in range(start, start + int(params['num'][0]))
+            ]}).encode()
+        elif url.path.endswith('.png'):
+            body = make_image_file().read()
+        else:
+            buffer = io.BytesIO()
+            PILImage.new('RGB', (4, 4)).save(buffer, format='BMP')
+            body = buffer.getvalue()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.django_db(transaction=True)
+class Test15GoogleImport:
+
+    @pytest.fixture
+    def google(self, settings):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), GoogleStandInHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        settings.GOOGLE_SEARCH_URL = (
+            f'http://127.0.0.1:{server.server_port}/search'
+        )
+        settings.GOOGLE_API_KEY = 'key'
+        settings.GOOGLE_PROJECT_CX = 'cx'
+        GoogleStandInHandler.requests = []
+        yield GoogleStandInHandler.requests
+        server.shutdown()
+        server.server_close()
+
+    def test_00_import_and_resume(self, google):
+        call_command('load_test_data', images_per_query=2, seed=3)
+        downloads = [path for path in google if path.startswith('/img/')]
+        assert Image.objects.count() == len(downloads) > 0, (
+            'Команда `load_test_data` должна импортировать найденные '
+            'изображения.'
+        )
+        png = Image.objects.filter(name__endswith='_2.png').first()
+        assert png.image.read() == make_image_file().read(), (
+            'Изображения разрешённого формата должны сохраняться без '
+            'перекодирования.'
+        )
+        assert set(Image.objects.values_list('extension', flat=True)) == {
+            'PNG'
+        }, 'Изображения других форматов должны конвертироваться в PNG.'
+
+        google.clear()
+        call_command('load_test_data', images_per_query=2, seed=3)
+        assert not [path for path in google if path.startswith('/img/')], (
+            'Повторный импорт не должен скачивать импортированные '
+            'изображения.'
+        )
+
+    def test_01_downloads_bounded(self, google, settings):
+        settings.IMAGE_IMPORT_THREADS = 2
+        host = settings.GOOGLE_SEARCH_URL.rsplit('/', 1)[0]
+        urls = [f'{host}/img/{num}.png' for num in range(10)]
+        submitted = []
+
+        def submit():
+            for url in urls:
+                submitted.append(url)
+                yield url
+
+        downloads = fetch_images(get_session(), submit())
+        url, image_file = next(downloads)
+        assert url == urls[0] and image_file is not None
+        assert len(submitted) <= settings.IMAGE_IMPORT_THREADS + 1, (
+            'Скачивания должны отправляться в пул не больше чем на '
+            '`IMAGE_IMPORT_THREADS` вперёд.'
+        )
+        assert [url for url, _ in downloads] == urls[1:], (
+            'Скачанные изображения должны возвращаться в порядке ссылок.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class Test16RequestMetrics:
+    url_images = '/api/v1/image/'
+    url_metrics = '/api/v1/metrics/'
+
+    @pytest.fixture(autouse=True)
+    def empty_metrics(self):
+        reset_view_metrics()
+
+    def test_00_server_timing(self, viewer_client, create_images):
+        create_images(3)
+        with CaptureQueriesContext(connection) as context:
+            response = viewer_client.get(self.url_images)
+        timing = {
+            metric.split(';')[0]: metric
+            for metric in response['Server-Timing'].split(', ')
+        }
+        assert set(timing) == {'db', 'serializer', 'total'}, (
+            'Заголовок `Server-Timing` должен содержать время запросов к '
+            'базе, сериализатора и общее время.'
+        )
+        assert f'queries={len(context.captured_queries)} ' in timing['db'], (
+            'Заголовок `Server-Timing` должен содержать число запросов к '
+            'базе.'
+        )
+
+    def test_01_duplicate_queries(self, create_images):
+        images = create_images(2)
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics.execute_wrapper):
+            for image in images:
+                Image.objects.filter(id=image.id).exists()
+            Image.objects.count()
+        assert (metrics.query_count, metrics.duplicate_query_count) == (3, 1), (
+            'Повторы одного SQL с другими параметрами должны считаться '
+            'дублирующимися запросами.'
+        )
+
+    def test_02_metrics_endpoint(self, viewer_client, django_user_model):
+        viewer_client.get(self.url_images)
+        response = viewer_client.get(self.url_metrics)
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Метрики должны быть доступны только администратору.'
+        )
+        admin = django_user_model.objects.create_superuser(
+            username='TestAdmin',
+            email='testadmin@pictura.fake',
+            password='TestAdmin',
+        )
+        admin_client = APIClient()
+        admin_client.cookies['jwt'] = str(AccessToken.for_user(admin))
+        response = admin_client.get(self.url_metrics)
+        assert response.status_code == HTTPStatus.OK
+        stats = response.json()['views']['image-list']
+        assert stats['total_ms']['count'] == 1, (
+            'Метрики должны собирать гистограммы времени по представлениям.'
+        )
+        assert sum(stats['total_ms']['buckets'].values()) == 1
+        assert set(response.json()['user_cache']) == {'hits', 'misses'}
+
+
+@pytest.mark.django_db(transaction=True)
+class Test17Feed:
+    url_images = '/api/v1/image/'
+    url_feed = '/api/v1/feed/'
+
+    def subscribe(self, subscriber, author):
+        return Subscription.objects.create(
+            user=subscriber, subscriber=subscriber, author=author
+        )
+
+    def test_00_fan_out_and_pages(self, author, viewer, author_client,
+                                  viewer_client, create_images, tags):
+        old_images = create_images(2)
+        subscription = self.subscribe(viewer, author)
+        response = author_client.post(self.url_images, data={
+            'name': 'Новое изображение',
+            'image': make_image_file('new.png'),
+            'license': 'free',
+            'price': 0,
+            'tags': [tags[0].id],
+        }, format='multipart')
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        new_id = response.json()['id']
+        assert TimelineEntry.objects.filter(user=viewer).count() == 3, (
+            'Лента должна заполняться последними изображениями автора '
+            'при подписке и новыми изображениями при публикации.'
+        )
+
+        response = viewer_client.get(self.url_feed, {'limit': 2})
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert [image['id'] for image in data['results']] == [
+            new_id, old_images[1].id
+        ], 'Лента должна начинаться с новых изображений.'
+        response = viewer_client.get(data['next'])
+        data = response.json()
+        assert [image['id'] for image in data['results']] == [
+            old_images[0].id
+        ]
+        assert data['next'] is None
+
+        subscription.delete()
+        response = viewer_client.get(self.url_feed)
+        assert response.json()['results'] == [], (
+            'После отписки изображения автора должны пропадать из ленты.'
+        )
+
+    def test_01_fan_out_on_read(self, author, viewer, viewer_client,
+                                create_images, settings):
+        settings.FEED_FANOUT_LIMIT = 0
+        images = create_images(3)
+        self.subscribe(viewer, author)
+        assert not TimelineEntry.objects.exists(), (
+            'Изображения популярных авторов не должны копироваться в ленты.'
+        )
+        response = viewer_client.get(self.url_feed)
+        assert [image['id'] for image in response.json()['results']] == [
+            image.id for image in reversed(images)
+        ], 'Изображения популярных авторов должны добавляться при чтении.'
+
+    def test_02_invalid_cursor(self, viewer_client):
+        response = viewer_client.get(self.url_feed, {'cursor': 'invalid'})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_03_backfill_after_unsubscribe(self, author, viewer,
+                                           viewer_client, create_images,
+                                           settings):
+        settings.JOBS_ALWAYS_EAGER = False
+        create_images(2)
+        self.subscribe(viewer, author).delete()
+        assert work(once=True) == 1
+        assert not TimelineEntry.objects.filter(user=viewer).exists(), (
+            'Отложенное заполнение ленты не должно добавлять изображения '
+            'автора после отписки.'
+        )
+        response = viewer_client.get(self.url_feed)
+        assert response.json()['results'] == []
@@ -0,0 +1,79 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tags.models import Tag
+
+
+@pytest.mark.django_db(transaction=True)
+class Test00TagList:
+    url_tags = '/api/v1/tags/'
+
+    def get_tags(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.url_tags)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Эндпоинт `{self.url_tags}` должен быть доступен.'
+        )
+        return response.json(), context.captured_queries
+
+    def test_00_tag_covers(self, viewer_client, create_images, tags):
+        images = create_images(2, tags=tags[:2])
+        data, _ = self.get_tags(viewer_client)
+        covers = {tag['id']: tag['tag_images'] for tag in data}
+        image_ids = {image.id for image in images}
+        for tag in tags[:2]:
+            assert len(covers[tag.id]) == 1, (
+                f'Эндпоинт `{self.url_tags}` должен возвращать обложку '
+                'для каждого тега с изображениями.'
+            )
+            assert covers[tag.id][0]['id'] in image_ids
+        assert covers[tags[2].id] == [], (
+            'У тега без изображений не должно быть обложки.'
+        )
+
+    def test_01_num_queries(self, viewer_client, create_images, tags):
+        create_images(3, tags=tags)
+        self.get_tags(viewer_client)
+        _, queries = self.get_tags(viewer_client)
+        for num in range(5):
+            Tag.objects.create(name=f'Новый тег {num}', slug=f'new-{num}')
+        create_images(2, tags=Tag.objects.all())
+        _, cached_queries = self.get_tags(viewer_client)
+        assert len(cached_queries) == len(queries), (
+            f'Количество запросов к БД на эндпоинте `{self.url_tags}` '
+            'не должно зависеть от количества тегов.'
+        )
+        assert not any(
+            'RANDOM()' in query['sql'] for query in cached_queries
+        ), (
+            f'Эндпоинт `{self.url_tags}` не должен сортировать таблицы '
+            'в случайном порядке.'
+        )
+
+    def test_02_cover_removed_with_image(self, client, create_images, tags):
+        image, = create_images(1, tags=tags[:1])
+        image.delete()
+        data, _ = self.get_tags(client)
+        assert all(tag['tag_images'] == [] for tag in data), (
+            'Удалённое изображение не должно оставаться обложкой тега.'
+        )
+
+    def test_03_anonymous_covers_not_cached(
+        self, client, create_images, tags
+    ):
+        images = create_images(2, tags=tags[:1])
+        covers = set()
+        for _ in range(20):
+            data, _ = self.get_tags(client)
+            covers.update(
+                image['id']
+                for tag in data if tag['id'] == tags[0].id
+                for image in tag['tag_images']
+            )
+        assert covers == {image.id for image in images}, (
+            'Обложка тега должна выбираться заново при каждом запросе '
+            'анонимного пользователя.'
+        )
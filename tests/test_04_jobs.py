@@ -0,0 +1,67 @@
+from http import HTTPStatus
+
+import pytest
+from django.core import mail
+
+from jobs.models import Job
+from jobs.queue import enqueue, work
+
+calls = []
+
+
+def record_call(value):
+    calls.append(value)
+
+
+def failing_job():
+    raise ValueError('Ошибка')
+
+
+@pytest.mark.django_db(transaction=True)
+class Test00JobQueue:
+    url_signup = '/api/v1/auth/signup/'
+
+    @pytest.fixture(autouse=True)
+    def queued(self, settings):
+        settings.JOBS_ALWAYS_EAGER = False
+        settings.JOBS_RETRY_DELAY = 0
+        calls.clear()
+
+    def test_00_enqueue_and_work(self):
+        job = enqueue(record_call, value=5)
+        assert calls == [], 'Задача не должна выполняться при постановке.'
+        assert work(once=True) == 1
+        job.refresh_from_db()
+        assert calls == [5]
+        assert job.status == Job.Status.DONE
+
+    def test_01_retries(self):
+        job = enqueue(failing_job, max_attempts=2)
+        assert work(once=True) == 2, (
+            'Упавшая задача должна перезапускаться.'
+        )
+        job.refresh_from_db()
+        assert job.status == Job.Status.FAILED
+        assert job.attempts == 2
+        assert 'ValueError' in job.last_error
+
+    def test_02_eager(self, settings):
+        settings.JOBS_ALWAYS_EAGER = True
+        assert enqueue(record_call, value=1) is None
+        assert calls == [1]
+        assert not Job.objects.exists()
+
+    def test_03_signup_email_is_queued(self, client):
+        response = client.post(self.url_signup, data={
+            'email': 'queued@pictura.fake',
+            'username': 'queued_user',
+            'password': 'Queued_password1',
+            'is_author': False,
+        })
+        assert response.status_code == HTTPStatus.OK, response.json()
+        assert len(mail.outbox) == 0, (
+            'Письмо с кодом подтверждения должно отправляться в фоне.'
+        )
+        work(once=True)
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['queued@pictura.fake']
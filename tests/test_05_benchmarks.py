@@ -0,0 +1,149 @@
+import json
+import os
+import random
+import statistics
+import time
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from images.models import Image
+from tags.models import Tag
+
+# The size of the catalog and the number of measured requests per
+# endpoint, raise them to benchmark a production-like catalog.
+BENCHMARK_USERS = int(os.getenv('BENCHMARK_USERS', 10))
+BENCHMARK_IMAGES = int(os.getenv('BENCHMARK_IMAGES', 100))
+BENCHMARK_ROUNDS = int(os.getenv('BENCHMARK_ROUNDS', 20))
+BENCHMARK_BUDGET = Path(os.getenv(
+    'BENCHMARK_BUDGET', Path(__file__).with_name('benchmark_budget.json')
+))
+# The latency budgets depend on the machine, so they are checked only
+# with `BENCHMARK=True`; the query budgets are checked on every run.
+BENCHMARK = os.getenv('BENCHMARK', 'False') == 'True'
+BENCHMARK_RESULTS = os.getenv('BENCHMARK_RESULTS')
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+
+
+def percentile(timings: list, percent: int) -> float:
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, len(timings) * percent // 100)]
+
+
+@pytest.mark.django_db(transaction=True)
+class Test00Benchmarks:
+    url_images = '/api/v1/image/'
+    url_tags = '/api/v1/tags/'
+
+    @pytest.fixture
+    def catalog(self):
+        call_command(
+            'load_test_data', synthetic=True, users=BENCHMARK_USERS,
+            images=BENCHMARK_IMAGES, tags_per_image=3, favorites_per_user=5,
+            downloads_per_user=5, subscriptions_per_user=3, image_size=32,
+            processes=2, seed=1,
+        )
+        call_command('rebuild_recommendations')
+        return (
+            list(Image.objects.values_list('id', flat=True)),
+            list(Tag.objects.values_list('slug', 'name')),
+        )
+
+    def get_requests(self, catalog, rnd: random.Random) -> dict:
+        """Returns the endpoints mapped to a factory of request paths."""
+        image_ids, tags = catalog
+        return {
+            'image_list': lambda: (self.url_images, {}),
+            'image_retrieve': lambda: (
+                f'{self.url_images}{rnd.choice(image_ids)}/', {}
+            ),
+            'image_filter_tags': lambda: (
+                self.url_images, {'tags': rnd.choice(tags)[0]}
+            ),
+            'image_filter_category': lambda: (
+                self.url_images, {'category': 'raster_image'}
+            ),
+            'image_filter_name': lambda: (
+                self.url_images, {'name': rnd.choice(tags)[1]}
+            ),
+            'tag_list': lambda: (self.url_tags, {}),
+            'image_download': lambda: (
+                f'{self.url_images}{rnd.choice(image_ids)}/download/', {}
+            ),
+        }
+
+    def measure(self, client, make_request) -> dict:
+        """
+        Sends `BENCHMARK_ROUNDS` requests after a warm-up one and returns
+        the latency percentiles and the largest number of SQL queries.
+        """
+        timings = []
+        queries = []
+        for round_num in range(BENCHMARK_ROUNDS + 1):
+            path, params = make_request()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(path, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == HTTPStatus.OK, (
+                f'Эндпоинт `{path}` должен быть доступен.'
+            )
+            if round_num:
+                timings.append(elapsed)
+                queries.append(len(context.captured_queries))
+        return {
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries),
+        }
+
+    def run_benchmarks(self, catalog, client) -> dict:
+        rnd = random.Random(0)
+        return {
+            name: self.measure(client, make_request)
+            for name, make_request in self.get_requests(catalog, rnd).items()
+        }
+
+    def check_budget(self, results: dict, metrics: tuple) -> None:
+        budget = json.loads(BENCHMARK_BUDGET.read_text())
+        assert set(budget) == set(results), (
+            f'Бюджет в `{BENCHMARK_BUDGET.name}` должен быть задан для '
+            'всех эндпоинтов.'
+        )
+        exceeded = [
+            f'{name}: {metric} {results[name][metric]} > {limit}'
+            for name, limits in budget.items()
+            for metric, limit in limits.items()
+            if metric in metrics and results[name][metric] > limit
+        ]
+        assert not exceeded, (
+            'Превышен бюджет производительности: ' + '; '.join(exceeded)
+        )
+
+    def test_00_query_budgets(self, catalog, viewer_client):
+        self.check_budget(
+            self.run_benchmarks(catalog, viewer_client), ('queries',)
+        )
+
+    @pytest.mark.benchmark
+    @pytest.mark.skipif(
+        not BENCHMARK, reason='Задайте BENCHMARK=True для замеров времени.'
+    )
+    def test_01_latency_budgets(self, catalog, viewer_client, tmp_path):
+        results = self.run_benchmarks(catalog, viewer_client)
+        results_path = Path(
+            BENCHMARK_RESULTS or tmp_path / 'benchmark_results.json'
+        )
+        results_path.write_text(json.dumps({
+            'users': BENCHMARK_USERS,
+            'images': BENCHMARK_IMAGES,
+            'rounds': BENCHMARK_ROUNDS,
+            'endpoints': results,
+        }, indent=2))
+        self.check_budget(results, LATENCY_METRICS)